@@ -0,0 +1,549 @@
+"""AST checks for the mistakes.py anti-patterns, files parsed in parallel and cached by content
+
+python antipatterns.py                          # scan_test and files_bench
+python antipatterns.py src/ --workers 8         # path:line:col: code message, exit code 1 if any
+python antipatterns.py src/ --select P002,P004 --cache .antipatterns.json
+
+A file that can not be read and a cache file that can not be loaded are E902 lines.
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import argparse
+import ast
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+# code: (message, the example in this repo)
+RULES = {
+    "P001": ("comparison to None with ==, use is", "mistakes.if_equal"),
+    "P002": ("str += in a loop, append to a list and str.join", "mistakes.func_str1"),
+    "P003": ("mutable default argument, use None", "mistakes.func_default_arg1"),
+    "P004": ("copy.deepcopy in a loop", "mistakes.mutable_test, fast_copy.json_deepcopy"),
+    "P005": ("global lookups in a loop, bind to a local", "mistakes.func_legb, bind_globals"),
+}
+# part of the cache key: bump on any rule change, findings of older rules are dropped
+RULES_VERSION = "3"
+CACHE_PATH = ".antipatterns_cache.json"
+
+_FUNCTIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)
+_SCOPES = _FUNCTIONS + (ast.ClassDef,)
+_LOOPS = (ast.For, ast.AsyncFor, ast.While)
+_COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+_MUTABLE_LITERALS = (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.DictComp, ast.SetComp)
+_MUTABLE_CALLS = frozenset(("list", "dict", "set", "bytearray", "deque", "defaultdict"))
+
+
+def _scope_nodes(nodes):
+    """Nodes of one scope, nested functions, classes and comprehensions are not entered"""
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        yield node
+        if not isinstance(node, _SCOPES + _COMPREHENSIONS):
+            stack.extend(ast.iter_child_nodes(node))
+
+
+def _bound_names(nodes):
+    """Names assigned in a scope: its locals, or the globals of a module
+
+    One walk: nonlocal names count as bound, global ones do not.
+    """
+    names = set()
+    declared_global = set()
+    for node in _scope_nodes(nodes):
+        if isinstance(node, ast.Name):
+            if not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, ast.Nonlocal):
+            names.update(node.names)
+        elif isinstance(node, ast.Global):
+            declared_global.update(node.names)
+    return names - declared_global
+
+
+def _dotted(node):
+    """copy.deepcopy for Attribute(Name("copy"), "deepcopy"), None for other calls"""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted(node.value)
+        return value and f"{value}.{node.attr}"
+    return None
+
+
+def _arg_names(args):
+    every = args.posonlyargs + args.args + args.kwonlyargs + [args.vararg, args.kwarg]
+    return {arg.arg for arg in every if arg is not None}
+
+
+class _Scope:
+    """report - P005 in its loops: functions and the comprehensions of functions"""
+
+    def __init__(self, local=(), function=False, report=None):
+        self.local = set(local)
+        self.function = function
+        self.report = function if report is None else report
+        self.str_names = set()
+        self.loops = []  # Counter of global lookups per enclosing loop, innermost last
+
+
+class _Checker(ast.NodeVisitor):
+    def __init__(self, module):
+        self.findings = []
+        self.module_names = _bound_names(module.body)
+        self.deepcopy_names = set()  # "copy.deepcopy", "deepcopy" after from copy import
+        self.scopes = [_Scope()]
+
+    def _add(self, node, code, detail=""):
+        message = RULES[code][0] + (f": {detail}" if detail else "")
+        self.findings.append((node.lineno, node.col_offset, code, message))
+
+    def _is_global(self, name):
+        # locals of the enclosing functions are closure cells, not globals; a builtin
+        # lookup misses the globals first, but print() or len() once per call is no finding
+        for scope in self.scopes:
+            if scope.function and name in scope.local:
+                return False
+        return name in self.module_names
+
+    def _is_str(self, node):
+        if isinstance(node, ast.Constant):
+            return isinstance(node.value, str)
+        if isinstance(node, ast.JoinedStr):
+            return True
+        if isinstance(node, ast.Name):
+            return node.id in self.scopes[-1].str_names
+        if isinstance(node, ast.BinOp):
+            if isinstance(node.op, ast.Add):
+                return self._is_str(node.left) or self._is_str(node.right)
+            return isinstance(node.op, (ast.Mult, ast.Mod)) and self._is_str(node.left)
+        if isinstance(node, ast.Call):
+            func = node.func
+            if isinstance(func, ast.Name):
+                return func.id in ("str", "repr", "format", "chr")
+            return isinstance(func, ast.Attribute) and self._is_str(func.value)
+        return False
+
+    def _in_loop(self):
+        return bool(self.scopes[-1].loops)
+
+    def _loop(self, node, inside, outside=()):
+        for child in outside:
+            self.visit(child)
+        scope = self.scopes[-1]
+        scope.loops.append(collections.Counter())
+        for child in inside:
+            self.visit(child)
+        # every global or dotted global lookup per iteration, a local bound before the loop
+        # does it once; the count is the lookups per iteration
+        lookups = sorted(scope.loops.pop().items())
+        if lookups and scope.report:
+            self._add(node, "P005", ", ".join(f"{name} x{count}" for name, count in lookups))
+
+    def visit_For(self, node):
+        self._loop(node, [node.target, *node.body], [node.iter])
+        for child in node.orelse:
+            self.visit(child)
+
+    visit_AsyncFor = visit_For
+
+    def visit_While(self, node):
+        self._loop(node, [node.test, *node.body])
+        for child in node.orelse:
+            self.visit(child)
+
+    def _visit_comprehension(self, node):
+        # a scope of its own: the targets are not locals of the enclosing function
+        first, *rest = node.generators
+        self.visit(first.iter)  # evaluated in the enclosing scope
+        targets = _bound_names([gen.target for gen in node.generators])
+        self.scopes.append(_Scope(targets, function=True, report=self.scopes[-1].report))
+        elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+        self._loop(node, [first.target, *first.ifs, *rest, *elements])
+        self.scopes.pop()
+
+    visit_ListComp = visit_SetComp = visit_DictComp = visit_GeneratorExp = _visit_comprehension
+
+    def _visit_function(self, node):
+        args = node.args
+        for default in args.defaults + [arg for arg in args.kw_defaults if arg is not None]:
+            if isinstance(default, _MUTABLE_LITERALS) or (
+                isinstance(default, ast.Call)
+                and isinstance(default.func, ast.Name)
+                and default.func.id in _MUTABLE_CALLS
+            ):
+                self._add(default, "P003")
+            self.visit(default)
+        for decorator in getattr(node, "decorator_list", ()):
+            self.visit(decorator)
+        body = node.body if isinstance(node.body, list) else [node.body]
+        self.scopes.append(_Scope(_arg_names(args) | _bound_names(body), function=True))
+        for child in body:
+            self.visit(child)
+        self.scopes.pop()
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_Lambda = _visit_function
+
+    def visit_ClassDef(self, node):
+        for child in node.bases + node.keywords + node.decorator_list:
+            self.visit(child)
+        self.scopes.append(_Scope())
+        for child in node.body:
+            self.visit(child)
+        self.scopes.pop()
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if alias.name == "copy":
+                self.deepcopy_names.add(f"{alias.asname or 'copy'}.deepcopy")
+
+    def visit_ImportFrom(self, node):
+        if node.module == "copy":
+            for alias in node.names:
+                if alias.name == "deepcopy":
+                    self.deepcopy_names.add(alias.asname or alias.name)
+
+    def visit_Name(self, node):
+        scope = self.scopes[-1]
+        if scope.loops and isinstance(node.ctx, ast.Load) and self._is_global(node.id):
+            scope.loops[-1][node.id] += 1
+
+    def visit_Attribute(self, node):
+        # math.sqrt is one lookup to hoist, counted as a chain and not as math
+        scope = self.scopes[-1]
+        name = _dotted(node)
+        if name is None or not scope.loops or not isinstance(node.ctx, ast.Load):
+            self.generic_visit(node)
+        elif self._is_global(name.split(".")[0]):
+            scope.loops[-1][name] += 1
+
+    def _track_str(self, target, value):
+        if isinstance(target, ast.Name):
+            if value is not None and self._is_str(value):
+                self.scopes[-1].str_names.add(target.id)
+            else:
+                self.scopes[-1].str_names.discard(target.id)
+
+    def visit_Assign(self, node):
+        self.generic_visit(node)
+        for target in node.targets:
+            self._track_str(target, node.value)
+
+    def visit_AnnAssign(self, node):
+        self.generic_visit(node)
+        is_str = isinstance(node.annotation, ast.Name) and node.annotation.id == "str"
+        self._track_str(node.target, ast.Constant("") if is_str else node.value)
+
+    def visit_AugAssign(self, node):
+        self.generic_visit(node)
+        if (
+            self._in_loop()
+            and isinstance(node.op, ast.Add)
+            and isinstance(node.target, ast.Name)
+            and (node.target.id in self.scopes[-1].str_names or self._is_str(node.value))
+        ):
+            self._add(node, "P002", node.target.id)
+
+    def visit_Compare(self, node):
+        self.generic_visit(node)
+        operands = [node.left, *node.comparators]
+        for index, op in enumerate(node.ops):
+            pair = operands[index : index + 2]
+            if isinstance(op, (ast.Eq, ast.NotEq)) and any(
+                isinstance(operand, ast.Constant) and operand.value is None for operand in pair
+            ):
+                self._add(node, "P001")
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if self._in_loop() and _dotted(node.func) in self.deepcopy_names:
+            self._add(node, "P004")
+
+
+def analyze_source(source, filename="<unknown>"):
+    """[(line, col, code, message)] of all rules, E999 for a file that does not parse"""
+    try:
+        module = ast.parse(source, filename)
+    except (SyntaxError, ValueError) as exc:
+        # msg, not str(exc): that names the file, and findings are cached by content
+        message = f"{type(exc).__name__}: {getattr(exc, 'msg', None) or exc}"
+        return [(getattr(exc, "lineno", None) or 1, 0, "E999", message)]
+    checker = _Checker(module)
+    checker.visit(module)
+    return sorted(checker.findings)
+
+
+def _analyze_item(item):
+    path, source = item
+    return path, analyze_source(source, path)
+
+
+def digest(source):
+    return hashlib.blake2b(source, digest_size=16).hexdigest()
+
+
+class ScanCache:
+    """content digest: findings as one JSON file, renamed and copied files hit as well
+
+    Entries are never pruned: delete the file to start over.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._findings = {}
+        self.error = None  # E902 message of a cache file that could not be loaded
+        if path and os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as file:
+                    data = json.load(file)
+            except (OSError, ValueError) as exc:
+                self.error = f"{type(exc).__name__}: {exc}, rebuilt"
+                return
+            if not isinstance(data, dict) or not isinstance(data.get("findings"), dict):
+                self.error = "not a scan cache, rebuilt"
+            elif data.get("rules") == RULES_VERSION:
+                self._findings = data["findings"]
+
+    def get(self, key):
+        findings = self._findings.get(key)
+        if findings is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [tuple(finding) for finding in findings]
+
+    def put(self, key, findings):
+        self._findings[key] = findings
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"rules": RULES_VERSION, "findings": self._findings}, file)
+        os.replace(tmp_path, self.path)
+
+
+def python_files(paths):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = sorted(name for name in dirs if not name.startswith((".", "__pycache__")))
+            for name in sorted(files):
+                if name.endswith(".py"):
+                    yield os.path.join(root, name)
+
+
+def _cpu_count():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def scan(paths, workers=None, cache=None):
+    """path: findings; the parent reads and hashes, only cache misses are parsed in workers
+
+    workers=1 or a handful of misses - parsed in this process, no pool start-up.
+    """
+    cache = cache if cache is not None else ScanCache()
+    results = {}
+    if cache.error:
+        results[cache.path] = [(1, 0, "E902", cache.error)]
+    misses = []
+    for path in python_files(paths):
+        try:
+            with open(path, "rb") as file:
+                source = file.read()
+        except OSError as exc:  # not cached: the file may be there on the next run
+            results[path] = [(1, 0, "E902", f"{type(exc).__name__}: {exc.strerror}")]
+            continue
+        key = digest(source)
+        findings = cache.get(key)
+        if findings is None:
+            misses.append((path, source, key))
+        else:
+            results[path] = findings
+    workers = min(workers or _cpu_count(), max(1, len(misses) // 16))
+    items = [(path, source) for path, source, _key in misses]
+    if workers == 1:
+        parsed = map(_analyze_item, items)
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+        parsed = executor.map(_analyze_item, items, chunksize=max(1, len(items) // workers // 4))
+    try:
+        for (path, findings), (_path, _source, key) in zip(parsed, misses):
+            cache.put(key, findings)
+            results[path] = findings
+    finally:
+        if workers > 1:
+            executor.shutdown()
+    if cache.path:
+        cache.save()
+    return results
+
+
+def print_findings(results, select=None):
+    count = 0
+    for path, findings in results.items():
+        for line, col, code, message in findings:
+            if select is None or code in select:
+                print(f"{path}:{line}:{col}: {code} {message}")
+                count += 1
+    return count
+
+
+def scan_test():
+    print()
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mistakes.py")
+    results = scan([path], workers=1)
+    print_findings({os.path.basename(path): findings for path, findings in results.items()})
+
+    source = b"""
+import copy as cp
+import math
+def hot(rows, table={}):
+    out = f"{len(rows)}"
+    for row in rows:
+        out += str(row)
+        table[row] = [cp.deepcopy(item) for item in rows if item != None]
+        table[row].append(math.sqrt(row) + math.sqrt(row + 1))
+    return out
+def norms(rows):
+    out = []
+    for row in rows:
+        out.append(math.sqrt(row))
+    return out
+"""
+    print()
+    for line, col, code, message in analyze_source(source, "sample.py"):
+        print(f"sample.py:{line}:{col}: {code} {message} (see {RULES[code][1]})")
+
+    print()
+    root = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(root, "cache.json")
+        with open(cache_path, "w", encoding="utf-8") as file:
+            file.write('{"rules": "3", "findings": ')  # cut off mid-write
+        results = scan([os.path.join(root, "missing.py")], workers=1, cache=ScanCache(cache_path))
+        print_findings({os.path.basename(path): findings for path, findings in results.items()})
+    finally:
+        shutil.rmtree(root)
+
+
+def _make_tree(root, n_files):
+    """n_files distinct modules, the sources of this directory cycled with a unique tail"""
+    sources = []
+    for path in python_files([os.path.dirname(os.path.abspath(__file__))]):
+        with open(path, "rb") as file:
+            sources.append(file.read())
+    paths = []
+    for i in range(n_files):
+        package = os.path.join(root, f"package{i // 100}")
+        os.makedirs(package, exist_ok=True)
+        path = os.path.join(package, f"module{i}.py")
+        with open(path, "wb") as file:
+            file.write(sources[i % len(sources)] + f"\n# copy {i}\n".encode())
+        paths.append(path)
+    return paths
+
+
+def files_bench(n_files=2000, changed=0.01):
+    """Files per second: cold scans by worker count, then warm cache re-scans"""
+    cpus = _cpu_count()
+    print(f"\n{n_files} files, {cpus} cpus:")
+    root = tempfile.mkdtemp()
+    try:
+        paths = _make_tree(os.path.join(root, "tree"), n_files)
+        cache_path = os.path.join(root, "cache.json")
+
+        def run(name, workers, path=None):
+            start_time = timeit.default_timer()
+            cache = ScanCache(path)
+            results = scan([os.path.join(root, "tree")], workers, cache)
+            exec_time = timeit.default_timer() - start_time
+            print(
+                f"    {name:24} parsed: {cache.misses:5} cached: {cache.hits:5}",
+                f"- {len(results) / exec_time:8.0f} files/s",
+            )
+
+        for workers in sorted({1, 2, cpus}):
+            run(f"cold, {workers} workers", workers)
+        run("cold, cache written", None, cache_path)
+        run("warm cache", None, cache_path)
+        for path in paths[:: int(1 / changed)]:
+            with open(path, "a", encoding="utf-8") as file:
+                file.write("# changed\n")
+        run(f"warm, {changed:.0%} changed", None, cache_path)
+    finally:
+        shutil.rmtree(root)
+
+
+def _test():
+    """Test and debug"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="files and directories, the demo without")
+    parser.add_argument("--workers", type=int, help="processes, all allowed cores by default")
+    parser.add_argument("--cache", default=CACHE_PATH, help="JSON cache file")
+    parser.add_argument("--no-cache", action="store_true", help="parse every file")
+    parser.add_argument("--select", help="comma separated codes: " + ", ".join(RULES))
+    args = parser.parse_args()
+
+    if not args.paths:
+        scan_test()
+        files_bench()
+        return
+    cache = ScanCache(None if args.no_cache else args.cache)
+    results = scan(args.paths, args.workers, cache)
+    select = set(args.select.split(",")) if args.select else None
+    if print_findings(results, select):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python antipatterns.py
+
+mistakes.py:121:26: P003 mutable default argument, use None
+mistakes.py:134:4: P005 global lookups in a loop, bind to a local: func_default_arg1 x1, func_default_arg2 x1
+mistakes.py:173:11: P001 comparison to None with ==, use is
+mistakes.py:231:4: P005 global lookups in a loop, bind to a local: BATCH_FUNCS x1, _batch x1
+mistakes.py:233:8: P005 global lookups in a loop, bind to a local: timeit.repeat x1
+mistakes.py:257:8: P002 str += in a loop, append to a list and str.join: ret_str
+
+sample.py:4:20: P003 mutable default argument, use None (see mistakes.func_default_arg1)
+sample.py:6:4: P005 global lookups in a loop, bind to a local: math.sqrt x2 (see mistakes.func_legb, bind_globals)
+sample.py:7:8: P002 str += in a loop, append to a list and str.join: out (see mistakes.func_str1)
+sample.py:8:21: P005 global lookups in a loop, bind to a local: cp.deepcopy x1 (see mistakes.func_legb, bind_globals)
+sample.py:8:22: P004 copy.deepcopy in a loop (see mistakes.mutable_test, fast_copy.json_deepcopy)
+sample.py:8:60: P001 comparison to None with ==, use is (see mistakes.if_equal)
+sample.py:13:4: P005 global lookups in a loop, bind to a local: math.sqrt x1 (see mistakes.func_legb, bind_globals)
+
+cache.json:1:0: E902 JSONDecodeError: Expecting value: line 1 column 28 (char 27), rebuilt
+missing.py:1:0: E902 FileNotFoundError: No such file or directory
+
+2000 files, 1 cpus:
+    cold, 1 workers          parsed:  2000 cached:     0 -      103 files/s
+    cold, 2 workers          parsed:  2000 cached:     0 -      103 files/s
+    cold, cache written      parsed:  2000 cached:     0 -      112 files/s
+    warm cache               parsed:     0 cached:  2000 -    15937 files/s
+    warm, 1% changed         parsed:    20 cached:  1980 -     3981 files/s
+"""
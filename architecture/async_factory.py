@@ -0,0 +1,149 @@
+"""Test async singleton factory"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import asyncio
+import timeit
+
+
+class AsyncSingleFactory:
+    """SingleFactory for objects with awaitable setup (connection handshake etc.)
+
+    Concurrent get_instance() calls share one in-flight init,
+    a failed init is not cached and the next call retries it.
+    _instance and _pending are read from the class's own __dict__, so every subclass
+    has its own instance and does not get its parent's.
+    """
+
+    inits = 0
+
+    def __init__(self, foo_value=None):
+        print(f"{type(self).__name__}: init")
+        type(self).inits += 1
+        self._foo = foo_value or "foo"
+
+    async def setup(self):
+        await asyncio.sleep(0.01)  # handshake
+
+    @classmethod
+    async def _create(cls, foo_value):
+        try:
+            instance = cls(foo_value)
+            await instance.setup()
+            cls._instance = instance
+            return instance
+        finally:
+            cls._pending = None
+
+    @classmethod
+    async def get_instance(cls, foo_value=None):
+        instance = cls.__dict__.get("_instance")
+        if instance is not None:
+            return instance
+        pending = cls.__dict__.get("_pending")
+        if pending is None:
+            pending = cls._pending = asyncio.ensure_future(cls._create(foo_value))
+        # A cancelled awaiter must not cancel the init shared with the others
+        return await asyncio.shield(pending)
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+        cls._pending = None
+
+    @property
+    def foo(self):
+        return self._foo
+
+    @foo.setter
+    def foo(self, value):
+        self._foo = value
+
+
+class FlakyFactory(AsyncSingleFactory):
+    inits = 0
+
+    async def setup(self):
+        await asyncio.sleep(0.01)
+        if type(self).inits == 1:
+            raise ConnectionError("handshake failed")
+
+
+# Wrong
+class NaiveAsyncFactory:
+    _instance = None
+    inits = 0
+
+    def __init__(self):
+        NaiveAsyncFactory.inits += 1
+
+    async def setup(self):
+        await asyncio.sleep(0.01)
+
+    @classmethod
+    async def get_instance(cls):
+        if not cls._instance:
+            instance = cls()
+            await instance.setup()
+            cls._instance = instance
+        return cls._instance
+
+
+async def _gather(get_instance, n_tasks):
+    start_time = timeit.default_timer()
+    instances = await asyncio.gather(*(get_instance() for _i in range(n_tasks)))
+    return timeit.default_timer() - start_time, len({id(obj) for obj in instances})
+
+
+async def coalesce_test(n_tasks=10 ** 4):
+    print()
+    for class_def in (NaiveAsyncFactory, AsyncSingleFactory):
+        exec_time, n_objects = await _gather(class_def.get_instance, n_tasks)
+        print(
+            f"{class_def.__name__} cold {n_tasks} tasks - inits: {class_def.inits}",
+            f"objects: {n_objects} exec time: {exec_time:.4f}",
+        )
+    exec_time, n_objects = await _gather(AsyncSingleFactory.get_instance, n_tasks)
+    print(
+        f"AsyncSingleFactory warm {n_tasks} tasks -",
+        f"objects: {n_objects} exec time: {exec_time:.4f}",
+    )
+
+
+async def retry_test():
+    print()
+    results = await asyncio.gather(
+        *(FlakyFactory.get_instance() for _i in range(3)), return_exceptions=True
+    )
+    print("FlakyFactory first try:", results)
+    print("FlakyFactory retry:", await FlakyFactory.get_instance(), "inits:", FlakyFactory.inits)
+    print("FlakyFactory cached:", await FlakyFactory.get_instance(), "inits:", FlakyFactory.inits)
+    parent = await AsyncSingleFactory.get_instance()
+    print("subclass has its own instance:", parent is not await FlakyFactory.get_instance())
+
+
+def _test():
+    """Test and debug"""
+    asyncio.run(coalesce_test())
+    asyncio.run(retry_test())
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python async_factory.py
+
+NaiveAsyncFactory cold 10000 tasks - inits: 10000 objects: 10000 exec time: 0.2627
+AsyncSingleFactory: init
+AsyncSingleFactory cold 10000 tasks - inits: 1 objects: 1 exec time: 0.2205
+AsyncSingleFactory warm 10000 tasks - objects: 1 exec time: 0.0961
+
+FlakyFactory: init
+FlakyFactory first try: [ConnectionError('handshake failed'), ConnectionError('handshake failed'), ConnectionError('handshake failed')]
+FlakyFactory: init
+FlakyFactory retry: <__main__.FlakyFactory object at 0x7f1137320950> inits: 2
+FlakyFactory cached: <__main__.FlakyFactory object at 0x7f1137320950> inits: 2
+subclass has its own instance: True
+"""
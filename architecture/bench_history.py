@@ -0,0 +1,227 @@
+"""Benchmark history and regression check for mistakes.py timing cases
+
+python bench_history.py record                   # run if_test/str_test, store in SQLite
+python bench_history.py compare --baseline abc123 # exit code 1 on a significant slowdown
+python bench_history.py list
+"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import argparse
+import datetime
+import itertools
+import json
+import math
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+
+import mistakes
+from benchmark import CASES, DEFAULT_CASES, Harness
+
+DB_PATH = "bench_history.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created TEXT NOT NULL,
+    python TEXT NOT NULL,
+    machine TEXT NOT NULL,
+    commit_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    median REAL NOT NULL,
+    samples TEXT NOT NULL,
+    PRIMARY KEY (run_id, name, args)
+);
+"""
+
+
+def python_version():
+    return f"{platform.python_implementation()} {platform.python_version()}"
+
+
+def machine_id():
+    return f"{platform.node()} {platform.system()} {platform.machine()}"
+
+
+def commit_id():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], check=True, capture_output=True, text=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("+dirty" if dirty else "")
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def save_run(conn, results, commit=None):
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO runs (created, python, machine, commit_id) VALUES (?, ?, ?, ?)",
+            (
+                datetime.datetime.now().isoformat(timespec="seconds"),
+                python_version(),
+                machine_id(),
+                commit or commit_id(),
+            ),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    cursor.lastrowid,
+                    result["name"],
+                    result["args"],
+                    result["number"],
+                    result["median"],
+                    json.dumps(result["samples"]),
+                )
+                for result in results
+            ],
+        )
+    return cursor.lastrowid
+
+
+def find_run(conn, commit):
+    """Latest run of the commit on this interpreter and machine"""
+    row = conn.execute(
+        "SELECT id FROM runs WHERE commit_id = ? AND python = ? AND machine = ? "
+        "ORDER BY id DESC LIMIT 1",
+        (commit, python_version(), machine_id()),
+    ).fetchone()
+    return row[0] if row else None
+
+
+def load_results(conn, run_id):
+    return {
+        (name, args): json.loads(samples)
+        for name, args, samples in conn.execute(
+            "SELECT name, args, samples FROM results WHERE run_id = ?", (run_id,)
+        )
+    }
+
+
+def permutation_test(baseline, current, rounds=10 ** 4, seed=0):
+    """One-sided p-value of mean(current) > mean(baseline)
+
+    Exact for small samples (5 + 5 repeats = 252 splits), Monte Carlo otherwise.
+    """
+    observed = statistics.mean(current) - statistics.mean(baseline)
+    pooled = baseline + current
+    size = len(current)
+    total = sum(pooled)
+
+    def diff(current_sum):
+        return current_sum / size - (total - current_sum) / len(baseline)
+
+    if math.comb(len(pooled), size) <= rounds:
+        splits = [diff(sum(split)) for split in itertools.combinations(pooled, size)]
+    else:
+        rand = random.Random(seed)
+        splits = [diff(sum(rand.sample(pooled, size))) for _i in range(rounds)]
+    return sum(split >= observed for split in splits) / len(splits)
+
+
+def compare(conn, baseline_commit, current_commit=None, alpha=0.05, threshold=0.05):
+    """Print per-case change and return regressions (significant and over threshold)"""
+    current_commit = current_commit or commit_id()
+    baseline_run = find_run(conn, baseline_commit)
+    current_run = find_run(conn, current_commit)
+    for commit, run_id in ((baseline_commit, baseline_run), (current_commit, current_run)):
+        if run_id is None:
+            raise LookupError(f"no run for commit {commit} on {python_version()} {machine_id()}")
+
+    baseline = load_results(conn, baseline_run)
+    current = load_results(conn, current_run)
+    regressions = []
+    print(f"\n{baseline_commit} -> {current_commit} ({python_version()}, {machine_id()})")
+    for key in sorted(baseline.keys() & current.keys()):
+        change = statistics.median(current[key]) / statistics.median(baseline[key]) - 1
+        p_value = permutation_test(baseline[key], current[key])
+        regression = change > threshold and p_value < alpha
+        if regression:
+            regressions.append(key)
+        print(
+            f"{key[0]}{key[1]}: {change:+.1%} p={p_value:.3f}",
+            "REGRESSION" if regression else "",
+        )
+    return regressions
+
+
+def _record(args):
+    harness = Harness(repeat=args.repeat)
+    with harness.install(mistakes):
+        for case in args.cases:
+            CASES[case]()
+    with connect(args.db) as conn:
+        run_id = save_run(conn, harness.results, args.commit)
+    print(f"\nrun {run_id} saved to {args.db}")
+
+
+def _compare(args):
+    with connect(args.db) as conn:
+        try:
+            regressions = compare(conn, args.baseline, args.current, args.alpha, args.threshold)
+        except LookupError as exc:
+            print(exc)
+            return 2
+    return 1 if regressions else 0
+
+
+def _list(args):
+    with connect(args.db) as conn:
+        for row in conn.execute("SELECT id, created, commit_id, python, machine FROM runs"):
+            print(*row, sep="  ")
+
+
+def _test():
+    """Test and debug"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH, help="SQLite file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="run cases and store the results")
+    record.add_argument("cases", nargs="*", default=list(DEFAULT_CASES), help=", ".join(CASES))
+    record.add_argument("--repeat", type=int, default=5, help="timed runs per case")
+    record.add_argument("--commit", help="store under this commit instead of git HEAD")
+    record.set_defaults(func=_record)
+
+    compare_cmd = commands.add_parser("compare", help="check the current commit for slowdowns")
+    compare_cmd.add_argument("--baseline", required=True, help="baseline commit")
+    compare_cmd.add_argument("--current", help="current commit, git HEAD by default")
+    compare_cmd.add_argument("--alpha", type=float, default=0.05, help="significance level")
+    compare_cmd.add_argument("--threshold", type=float, default=0.05, help="min slowdown")
+    compare_cmd.set_defaults(func=_compare)
+
+    commands.add_parser("list", help="list stored runs").set_defaults(func=_list)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        for case in args.cases:
+            if case not in CASES:
+                parser.error(f"unknown case {case!r}, choose from {', '.join(CASES)}")
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    _test()
@@ -0,0 +1,201 @@
+"""Run each benchmark in a fresh process, one per core, instead of mistakes._test() in a row"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import argparse
+import concurrent.futures
+import contextlib
+import importlib
+import inspect
+import io
+import json
+import multiprocessing
+import os
+import sys
+import timeit
+
+import benchmark
+
+try:
+    import resource
+except ImportError:  # Windows, no max rss
+    resource = None
+
+
+def discover(module_name):
+    """Functions calling @print_exec_time cases (if_test, str_test) and *_bench functions"""
+    module = importlib.import_module(module_name)
+    members = inspect.getmembers(module, inspect.isfunction)
+    timed = {name for name, func in members if hasattr(func, "__wrapped__")}
+    found = []
+    for name, func in members:
+        if func.__module__ != module.__name__ or name in timed or name.startswith("_"):
+            continue
+        if name.endswith("_bench") or timed & set(func.__code__.co_names):
+            found.append(f"{module_name}.{name}")
+    return found
+
+
+class _Recorder:
+    """print_exec_time single shot, but the result is collected for the parent"""
+
+    def __init__(self):
+        self.results = []
+
+    def measure(self, func, arg=(), kwarg=None):
+        kwarg = kwarg or {}
+        start_time = timeit.default_timer()
+        ret = func(*arg, **kwarg)
+        exec_time = timeit.default_timer() - start_time
+        result = {"name": func.__qualname__, "args": repr(arg), "kwargs": repr(kwarg)}
+        self.results.append({**result, "exec_time": exec_time})
+        print(f"{func.__qualname__}{arg!r} - exec time: {exec_time}")
+        return ret
+
+
+def run_case(case, cpu=None, repeat=None):
+    """Worker side: a fresh interpreter per case, so no heap or cache is left by the previous one"""
+    if cpu is not None:
+        os.sched_setaffinity(0, {cpu})
+    harness = _Recorder() if repeat is None else benchmark.Harness(repeat=repeat)
+    module_name, func_name = case.rsplit(".", 1)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        module = importlib.import_module(module_name)
+        func = getattr(module, func_name)
+        if hasattr(module, "EXEC_TIME_HARNESS"):
+            module.EXEC_TIME_HARNESS = harness  # the worker exits after the case
+        start_time = timeit.default_timer()
+        func()
+        wall_time = timeit.default_timer() - start_time
+    return {
+        "case": case,
+        "cpu": cpu,
+        "pid": os.getpid(),
+        "wall_time": wall_time,
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else None,
+        "results": harness.results,
+        "output": output.getvalue(),
+    }
+
+
+def _cpus(pin, workers, n_cases):
+    """A core per worker to pin it to, or None per worker; workers=None - all cores"""
+    if not pin:
+        return [None] * min(workers or os.cpu_count() or 1, n_cases)
+    if not hasattr(os, "sched_setaffinity"):
+        raise RuntimeError("os.sched_setaffinity is not available on this platform")
+    cpus = sorted(os.sched_getaffinity(0))
+    return cpus[: min(workers or len(cpus), n_cases)]
+
+
+def run_all(cases, workers=None, pin=False, repeat=None):
+    """Results in the order of cases, every case in its own spawned worker
+
+    With pin=True a core runs one case at a time: a case gets a free core
+    from the parent and gives it back when it is done.
+    Before Python 3.11 a worker is reused for the next case, so it may find the modules
+    of an earlier case imported already.
+    """
+    free_cpus = _cpus(pin, workers, len(cases))
+    results = {}
+    pending = {}
+    queue = list(cases)
+    # a fresh worker per case, max_tasks_per_child is new in 3.11
+    fresh = {"max_tasks_per_child": 1} if sys.version_info >= (3, 11) else {}
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=len(free_cpus), mp_context=multiprocessing.get_context("spawn"), **fresh
+    )
+    with executor:
+        while queue or pending:
+            while queue and free_cpus:
+                cpu = free_cpus.pop()
+                future = executor.submit(run_case, queue.pop(0), cpu, repeat)
+                pending[future] = cpu
+            done, _not_done = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                free_cpus.append(pending.pop(future))
+                result = future.result()
+                results[result["case"]] = result
+    return [results[case] for case in cases]
+
+
+def serial_run(cases):
+    """Baseline: every case in this process, one after another, like mistakes._test()"""
+    start_time = timeit.default_timer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for case in cases:
+            module_name, func_name = case.rsplit(".", 1)
+            getattr(importlib.import_module(module_name), func_name)()
+    return timeit.default_timer() - start_time
+
+
+def print_report(results, wall_time):
+    for result in results:
+        print(f"\n{result['case']} (pid {result['pid']} cpu {result['cpu']}):", end="")
+        print(result["output"].rstrip("\n"))
+    print()
+    for result in results:
+        print(f"{result['case']:24} wall time: {result['wall_time']:.3f} s", end=" ")
+        print(f"max rss: {result['max_rss'] / 2 ** 20:.1f} MiB" if result["max_rss"] else "")
+    print(f"{'suite':24} wall time: {wall_time:.3f} s")
+
+
+def _test():
+    """Test and debug"""
+    parser = argparse.ArgumentParser(description="Run benchmarks in isolated worker processes")
+    parser.add_argument("modules", nargs="*", default=["mistakes"], help="modules to discover")
+    parser.add_argument("-k", dest="select", help="run cases containing this substring")
+    parser.add_argument("--workers", type=int, help="processes, all cores by default")
+    parser.add_argument("--pin", action="store_true", help="pin every worker to its own core")
+    parser.add_argument("--repeat", type=int, help="benchmark.Harness repeat runs per call")
+    parser.add_argument("--serial", action="store_true", help="also time a serial in-process run")
+    parser.add_argument("--json", metavar="PATH", help="write results to a JSON file")
+    args = parser.parse_args()
+
+    cases = [case for module in args.modules for case in discover(module)]
+    if args.select:
+        cases = [case for case in cases if args.select in case]
+    if not cases:
+        parser.error("no benchmark functions found")
+
+    start_time = timeit.default_timer()
+    results = run_all(cases, args.workers, args.pin, args.repeat)
+    print_report(results, timeit.default_timer() - start_time)
+    if args.serial:
+        print(f"{'serial in-process':24} wall time: {serial_run(cases):.3f} s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"python": sys.version, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python bench_runner.py
+
+mistakes.if_test (pid 4752 cpu None):
+if_is(None,) - exec time: 0.21018766999986838
+if_equal(None,) - exec time: 0.40339888899961807
+if_none(None,) - exec time: 0.305792410000322
+
+if_is([],) - exec time: 0.2512334830007603
+if_equal([],) - exec time: 0.43956649099982315
+if_none([],) - exec time: 0.3604820380005549
+
+mistakes.str_test (pid 4755 cpu None):
+func_str1(100,) - exec time: 0.0019139920004818123
+func_str2(100,) - exec time: 0.0007860609994168044
+
+func_str1(1000,) - exec time: 0.0083468709999579
+func_str2(1000,) - exec time: 0.004521785000179079
+
+mistakes.if_test         wall time: 1.971 s max rss: 16.9 MiB
+mistakes.str_test        wall time: 0.016 s max rss: 27.5 MiB
+suite                    wall time: 2.365 s
+"""
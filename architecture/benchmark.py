@@ -0,0 +1,203 @@
+"""Benchmark harness for print_exec_time cases"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import argparse
+import contextlib
+import gc
+import json
+import math
+import statistics
+import sys
+import timeit
+
+import mistakes
+
+
+def percentile(values, percent):
+    """Linear interpolation between closest ranks, values must be sorted"""
+    if len(values) == 1:
+        return values[0]
+    rank = (len(values) - 1) * percent / 100
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def summarize(times, number, percentiles=(50, 90, 99)):
+    """Per call seconds stats of repeat runs of number calls each"""
+    per_call = sorted(exec_time / number for exec_time in times)
+    stats = {
+        "number": number,
+        "repeat": len(per_call),
+        "min": per_call[0],
+        "max": per_call[-1],
+        "median": statistics.median(per_call),
+        "mean": statistics.mean(per_call),
+        "stdev": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "samples": [exec_time / number for exec_time in times],
+    }
+    for percent in percentiles:
+        stats[f"p{percent}"] = percentile(per_call, percent)
+    return stats
+
+
+def _time_loop(func, arg, kwarg, number):
+    ret = None
+    start_time = timeit.default_timer()
+    for _i in range(number):
+        ret = func(*arg, **kwarg)
+    return timeit.default_timer() - start_time, ret
+
+
+class Harness:
+    """Warmup, calibrated loops, repeat runs and stats instead of one noisy shot
+
+    with Harness(repeat=7).install(mistakes) as harness:
+        mistakes.if_test()  # unchanged, every @print_exec_time call is measured
+    """
+
+    def __init__(self, warmup=1, repeat=5, number=None, min_time=0.2, gc_enabled=False):
+        self.warmup = warmup
+        self.repeat = repeat
+        self.number = number  # None - calibrate, so one run takes at least min_time
+        self.min_time = min_time
+        self.gc_enabled = gc_enabled
+        self.results = []
+
+    def calibrate(self, func, arg, kwarg):
+        number = 1
+        while True:
+            exec_time, _ret = _time_loop(func, arg, kwarg, number)
+            if exec_time >= self.min_time:
+                return number
+            # jump close to min_time instead of doubling from 1 for sub-microsecond bodies
+            number = max(number * 2, int(number * self.min_time / max(exec_time, 1e-9)))
+
+    def measure(self, func, arg=(), kwarg=None):
+        """Return value of the last call passes through"""
+        kwarg = kwarg or {}
+        ret = None
+        for _i in range(self.warmup):
+            ret = func(*arg, **kwarg)
+        number = self.number or self.calibrate(func, arg, kwarg)
+
+        gc_was_enabled = gc.isenabled()
+        times = []
+        try:
+            for _i in range(self.repeat):
+                gc.collect()
+                if not self.gc_enabled:
+                    gc.disable()
+                exec_time, ret = _time_loop(func, arg, kwarg, number)
+                times.append(exec_time)
+                if gc_was_enabled:
+                    gc.enable()
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        result = {
+            "name": func.__qualname__,
+            "args": repr(arg),
+            "kwargs": repr(kwarg),
+            **summarize(times, number),
+        }
+        self.results.append(result)
+        print_result(result)
+        return ret
+
+    @contextlib.contextmanager
+    def install(self, module=mistakes):
+        """Route module.print_exec_time through this harness"""
+        previous = module.EXEC_TIME_HARNESS
+        module.EXEC_TIME_HARNESS = self
+        try:
+            yield self
+        finally:
+            module.EXEC_TIME_HARNESS = previous
+
+    def dump(self, file):
+        json.dump({"python": sys.version, "results": self.results}, file, indent=2)
+
+
+def _fmt(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * scale >= 1:
+            return f"{seconds * scale:.3f} {unit}"
+    return f"{seconds * 1e9:.1f} ns"
+
+
+def print_result(result):
+    print(
+        f"{result['name']}{result['args']}:",
+        f"median {_fmt(result['median'])} min {_fmt(result['min'])}",
+        f"mean {_fmt(result['mean'])} stdev {_fmt(result['stdev'])}",
+        f"p90 {_fmt(result['p90'])} p99 {_fmt(result['p99'])}",
+        f"({result['repeat']}x{result['number']})",
+    )
+
+
+CASES = {
+    "if_test": mistakes.if_test,
+    "str_test": mistakes.str_test,
+    "if_batch_test": mistakes.if_batch_test,  # needs numpy
+}
+DEFAULT_CASES = ("if_test", "str_test")
+
+
+def _size(value):
+    """10000000 or 1e7"""
+    return int(float(value))
+
+
+def _test():
+    """Test and debug"""
+    parser = argparse.ArgumentParser(description="Run mistakes.py timing cases with stats")
+    parser.add_argument("cases", nargs="*", default=list(DEFAULT_CASES), help=", ".join(CASES))
+    parser.add_argument("--warmup", type=int, default=1, help="calls before timing")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs")
+    parser.add_argument("--number", type=int, help="calls per run, calibrated by default")
+    parser.add_argument("--min-time", type=float, default=0.2, help="calibrated run seconds")
+    parser.add_argument("--gc", action="store_true", help="keep GC enabled while timing")
+    parser.add_argument("--json", metavar="PATH", help="write results to a JSON file")
+    parser.add_argument("--sizes", type=_size, nargs="+", help="if_batch_test sizes: 1e7 1e8")
+    args = parser.parse_args()
+    for case in args.cases:
+        if case not in CASES:
+            parser.error(f"unknown case {case!r}, choose from {', '.join(CASES)}")
+
+    harness = Harness(args.warmup, args.repeat, args.number, args.min_time, args.gc)
+    with harness.install(mistakes):
+        for case in args.cases:
+            if case == "if_batch_test" and args.sizes:
+                CASES[case](args.sizes, args.repeat)
+            else:
+                CASES[case]()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            harness.dump(file)
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python benchmark.py
+
+if_is(None,): median 244.951 ms min 207.421 ms mean 244.351 ms stdev 23.833 ms p90 265.139 ms p99 272.348 ms (5x1)
+if_equal(None,): median 323.942 ms min 292.294 ms mean 321.494 ms stdev 19.902 ms p90 339.769 ms p99 341.334 ms (5x1)
+if_none(None,): median 266.942 ms min 251.407 ms mean 274.289 ms stdev 31.115 ms p90 305.207 ms p99 325.637 ms (5x1)
+
+if_is([],): median 183.609 ms min 179.377 ms mean 186.364 ms stdev 8.042 ms p90 195.227 ms p99 198.024 ms (5x2)
+if_equal([],): median 420.938 ms min 336.136 ms mean 420.290 ms stdev 69.653 ms p90 491.314 ms p99 509.227 ms (5x1)
+if_none([],): median 276.904 ms min 264.932 ms mean 298.195 ms stdev 36.778 ms p90 339.320 ms p99 345.148 ms (5x1)
+
+func_str1(100,): median 1.243 ms min 1.101 ms mean 1.314 ms stdev 205.166 us p90 1.529 ms p99 1.632 ms (5x260)
+func_str2(100,): median 343.619 us min 281.655 us mean 329.304 us stdev 33.348 us p90 357.665 us p99 365.704 us (5x762)
+
+func_str1(1000,): median 1.314 ms min 1.190 ms mean 1.617 ms stdev 744.454 us p90 2.319 ms p99 2.880 ms (5x272)
+func_str2(1000,): median 904.938 us min 825.817 us mean 939.272 us stdev 123.047 us p90 1.074 ms p99 1.096 ms (5x231)
+"""
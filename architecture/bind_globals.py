@@ -0,0 +1,345 @@
+"""Bind globals and builtins as constants, LEGB lookups (func_legb) done at decoration time"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import ast
+import builtins
+import collections
+import dis
+import inspect
+import json
+import subprocess
+import sys
+import timeit
+import types
+
+_LOAD_GLOBAL = dis.opmap["LOAD_GLOBAL"]
+_STORE_GLOBALS = (dis.opmap["STORE_GLOBAL"], dis.opmap["DELETE_GLOBAL"])
+_LOAD_CONST = dis.opmap["LOAD_CONST"]
+_NOP = dis.opmap["NOP"]
+_JUMP_FORWARD = dis.opmap["JUMP_FORWARD"]
+_JUMP_UNIT = 1 if sys.version_info >= (3, 10) else 2  # jump args count bytes before 3.10
+_PUSH_NULL = dis.opmap.get("PUSH_NULL")  # 3.11+, LOAD_GLOBAL with the low bit of arg set
+_NULL_FIRST = sys.version_info < (3, 13)
+
+
+def _walk_code(code):
+    yield code
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _walk_code(const)
+
+
+def _names(code, opcodes):
+    return {
+        instr.argval
+        for sub_code in _walk_code(code)
+        for instr in dis.get_instructions(sub_code)
+        if instr.opcode in opcodes
+    }
+
+
+def _const_index(consts, value):
+    for i, const in enumerate(consts):
+        if const is value:
+            return i
+    consts.append(value)
+    return len(consts) - 1
+
+
+def _load_const(index):
+    ops = []
+    for shift in (24, 16, 8):
+        if index >> shift:
+            ops.append((dis.EXTENDED_ARG, (index >> shift) & 0xFF))
+    ops.append((_LOAD_CONST, index & 0xFF))
+    return ops
+
+
+def _rewrite(code, values):
+    """LOAD_GLOBAL name -> LOAD_CONST value in the same bytes
+
+    The slot of LOAD_GLOBAL with its EXTENDED_ARG prefix and inline caches (3.11+)
+    is refilled and padded, so jump offsets and the exception table stay valid.
+    """
+    consts = [
+        _rewrite(const, values) if isinstance(const, types.CodeType) else const
+        for const in code.co_consts
+    ]
+    raw = bytearray(code.co_code)
+    instructions = list(dis.get_instructions(code))
+    slot_start = None
+    for index, instr in enumerate(instructions):
+        if instr.opcode == dis.EXTENDED_ARG:
+            slot_start = instr.offset if slot_start is None else slot_start
+            continue
+        start = instr.offset if slot_start is None else slot_start
+        slot_start = None
+        if instr.opcode != _LOAD_GLOBAL or instr.argval not in values:
+            continue
+        end = instructions[index + 1].offset if index + 1 < len(instructions) else len(raw)
+
+        push_null = _PUSH_NULL is not None and instr.arg & 1
+        ops = [(_PUSH_NULL, 0)] if push_null and _NULL_FIRST else []
+        ops += _load_const(_const_index(consts, values[instr.argval]))
+        ops += [(_PUSH_NULL, 0)] if push_null and not _NULL_FIRST else []
+        padding = (end - start) // 2 - len(ops)
+        if padding < 0:
+            raise ValueError(f"no room for LOAD_CONST of {instr.argval!r} in {code.co_name}")
+        if padding > 1:  # one dispatch over the dead caches instead of a NOP each
+            ops.append((_JUMP_FORWARD, (padding - 1) * _JUMP_UNIT))
+            padding -= 1
+        ops += [(_NOP, 0)] * padding
+        raw[start:end] = bytes(byte for op in ops for byte in op)
+    return code.replace(co_code=bytes(raw), co_consts=tuple(consts))
+
+
+_MODULE_BINDINGS = {}
+
+
+def _count_bindings(nodes, counts, declared):
+    """Module level binding statements per name, `global name` anywhere counts as rebinding"""
+    for node in nodes:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+            if not isinstance(node, ast.Lambda):
+                counts[node.name] += 1
+            for sub_node in ast.walk(node):  # nested scopes bind module names only by `global`
+                if isinstance(sub_node, ast.Global):
+                    declared.update(sub_node.names)
+            continue
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            counts[node.id] += 1
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                counts[alias.asname or alias.name.split(".")[0]] += 1
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            counts[node.name] += 1
+        _count_bindings(ast.iter_child_nodes(node), counts, declared)
+
+
+def _module_bindings(func):
+    """(binding counts, names under `global`) of the module source, None without source"""
+    module = sys.modules.get(func.__module__)
+    if module is None:
+        return None
+    if module.__name__ not in _MODULE_BINDINGS:
+        try:
+            tree = ast.parse(inspect.getsource(module))
+        except (OSError, TypeError):
+            _MODULE_BINDINGS[module.__name__] = None
+        else:
+            counts, declared = collections.Counter(), set()
+            _count_bindings(tree.body, counts, declared)
+            _MODULE_BINDINGS[module.__name__] = counts, declared
+    return _MODULE_BINDINGS[module.__name__]
+
+
+def _builtins(func):
+    value = func.__globals__.get("__builtins__", builtins)
+    return value if isinstance(value, dict) else vars(value)
+
+
+def _refusal(name, func, bindings, stored):
+    """Why name must stay a global lookup, None - safe to bind"""
+    if name in stored:
+        return f"assigned by {func.__qualname__} itself"
+    if bindings is None:
+        return f"source of module {func.__module__} is not available"
+    counts, declared = bindings
+    if name in declared:
+        return f"rebound by a `global {name}` statement in {func.__module__}"
+    if name in func.__globals__:
+        if counts[name] > 1:
+            return f"bound {counts[name]} times in module {func.__module__}"
+    elif counts[name]:
+        return f"builtin is shadowed later in module {func.__module__}"
+    return None
+
+
+def bind_globals(*names):
+    """@bind_globals - every global and builtin that is never rebound in the module source
+    @bind_globals("len", "GLOBAL_VAR1") - these names, ValueError if one is rebound
+
+    Values are taken once at decoration time, mutable objects (GLOBAL_VAR1.append) are
+    shared as usual. Assignments from other modules (mistakes.EXEC_TIME_HARNESS = ...) are
+    not visible in the source, stale_bindings() reports them after the fact.
+    """
+    if len(names) == 1 and callable(names[0]):
+        return _bind(names[0], None)
+    return lambda func: _bind(func, names)
+
+
+def _bind(func, names):
+    code = func.__code__
+    stored = _names(code, _STORE_GLOBALS)
+    bindings = _module_bindings(func)
+    builtin_values = _builtins(func)
+    values = {}
+    for name in sorted(_names(code, (_LOAD_GLOBAL,))) if names is None else names:
+        if name in func.__globals__:
+            value = func.__globals__[name]
+        elif name in builtin_values:
+            value = builtin_values[name]
+        elif names is None:
+            continue
+        else:
+            raise NameError(f"name {name!r} is not defined")
+        reason = _refusal(name, func, bindings, stored)
+        if reason is None:
+            values[name] = value
+        elif names is not None:
+            raise ValueError(f"cannot bind {name!r}: {reason}")
+
+    bound = types.FunctionType(
+        _rewrite(code, values), func.__globals__, func.__name__, func.__defaults__, func.__closure__
+    )
+    bound.__kwdefaults__ = func.__kwdefaults__
+    bound.__qualname__ = func.__qualname__
+    bound.__doc__ = func.__doc__
+    bound.__dict__.update(func.__dict__)
+    bound.__bound_globals__ = values
+    return bound
+
+
+def stale_bindings(func):
+    """Bound names whose global or builtin was rebound since decoration"""
+    builtin_values = _builtins(func)
+    stale = []
+    for name, value in func.__bound_globals__.items():
+        current = func.__globals__.get(name, builtin_values.get(name))
+        if current is not value:
+            stale.append(name)
+    return stale
+
+
+GLOBAL_VAR1 = []
+COUNTER = 0
+
+
+def count_empty(values):
+    count = 0
+    for value in values:
+        if isinstance(value, list) and len(value) == len(GLOBAL_VAR1):
+            count += 1
+    return count
+
+
+def bump():
+    global COUNTER  # pylint: disable=global-statement
+    COUNTER += 1
+
+
+def bind_test():
+    print()
+    bound = bind_globals(count_empty)
+    values = [[], [1], None, []]
+    print("bound names:", sorted(bound.__bound_globals__))
+    print("count_empty:", count_empty(values), "bound:", bound(values))
+
+    for names in (("len", "COUNTER"), ("undefined_name",)):
+        try:
+            bind_globals(*names)(bump)
+        except (ValueError, NameError) as exc:
+            print(f"bind_globals{names}:", type(exc).__name__, exc)
+    print("bump auto bound names:", bind_globals(bump).__bound_globals__)
+
+    GLOBAL_VAR1.append(1)  # mutation is seen, the list object is bound
+    print("count_empty after GLOBAL_VAR1.append:", count_empty(values), "bound:", bound(values))
+    GLOBAL_VAR1.clear()
+    globals()["GLOBAL_VAR1"] = [1]  # as another module would do, bound still sees the old list
+    print("count_empty after rebinding:", count_empty(values), "bound:", bound(values))
+    print("stale_bindings:", stale_bindings(bound))
+
+
+# not small ints, 3.12+ skips refcounting of immortal objects and the stores get cheaper
+BENCH_GLOBAL = 1.5
+
+_LOOKUP_CASES = {
+    "const": ("", "1.5"),
+    "local": ("value = 1.5", "value"),
+    "enclosing": (None, "value"),
+    "global": ("", "BENCH_GLOBAL"),
+    "builtin": ("", "len"),
+}
+
+
+def _lookup_func(case, per_loop):
+    setup, name = _LOOKUP_CASES[case]
+    loads = "; ".join([f"x = {name}"] * per_loop)
+    if setup is None:  # LOAD_DEREF from the enclosing function
+        source = (
+            "def outer():\n    value = 1.5\n    def lookup(n):\n"
+            f"        for _i in range(n):\n            {loads}\n    return lookup\n"
+        )
+    else:
+        source = f"def lookup(n):\n    {setup}\n    for _i in range(n):\n        {loads}\n"
+    namespace = {}
+    exec(compile(source, f"<{case}>", "exec"), globals(), namespace)  # pylint: disable=exec-used
+    return namespace["outer"]() if setup is None else namespace["lookup"]
+
+
+def lookup_bench(number=10 ** 6, per_loop=20, repeat=5):
+    """ns per name lookup over LOAD_CONST, per_loop lookups per loop iteration"""
+    funcs = {case: _lookup_func(case, per_loop) for case in _LOOKUP_CASES}
+    funcs["bound global"] = bind_globals("BENCH_GLOBAL")(funcs["global"])
+    funcs["bound builtin"] = bind_globals("len")(funcs["builtin"])
+    times = {}
+    for case, func in funcs.items():
+        func(number)  # warmup, 3.11+ specializes the hot loop
+        times[case] = min(timeit.repeat(lambda func=func: func(number), number=1, repeat=repeat))
+    return {
+        case: (exec_time - times["const"]) / (number * per_loop) * 1e9
+        for case, exec_time in times.items()
+        if case != "const"
+    }
+
+
+def versions_bench(pythons):
+    """lookup_bench in every interpreter, each prints its results as JSON"""
+    results = {}
+    for python in pythons:
+        output = subprocess.run(
+            [python, __file__, "--json"], capture_output=True, check=True, text=True
+        ).stdout
+        result = json.loads(output)
+        results[result["version"]] = result["lookups"]
+    cases = list(next(iter(results.values())))
+    print(f"\n{'ns per lookup':14}", *[f"{case:>13}" for case in cases])
+    for version, lookups in results.items():
+        print(f"{version:14}", *[f"{lookups[case]:13.2f}" for case in cases])
+
+
+def _test():
+    """Test and debug"""
+    if sys.argv[1:] == ["--json"]:
+        version = ".".join(map(str, sys.version_info[:3]))
+        print(json.dumps({"version": version, "lookups": lookup_bench()}))
+        return
+    bind_test()
+    versions_bench(sys.argv[1:] or [sys.executable])
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python bind_globals.py python3.8 python3.9 python3.10 python3.11 python3.12 python3.13
+
+bound names: ['GLOBAL_VAR1', 'isinstance', 'len', 'list']
+count_empty: 2 bound: 2
+bind_globals('len', 'COUNTER'): ValueError cannot bind 'COUNTER': assigned by bump itself
+bind_globals('undefined_name',): NameError name 'undefined_name' is not defined
+bump auto bound names: {}
+count_empty after GLOBAL_VAR1.append: 1 bound: 1
+count_empty after rebinding: 1 bound: 2
+stale_bindings: ['GLOBAL_VAR1']
+
+ns per lookup          local     enclosing        global       builtin  bound global bound builtin
+3.8.18                 -0.25          1.01          6.94         17.00         -0.21          0.11
+3.9.18                  0.33          0.23          9.03         16.06          0.81          0.26
+3.10.13                 1.26          1.04         10.04         17.56          0.46          2.49
+3.11.7                 -0.05          0.14          2.49          2.76          0.34          0.31
+3.12.1                  0.09          0.61          0.30          1.09          0.36          0.53
+3.13.0                 -0.80         -0.21         -0.55          0.03         -0.87         -0.48
+"""
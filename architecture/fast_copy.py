@@ -0,0 +1,155 @@
+"""Fast deep copy of JSON-like trees instead of copy.deepcopy (mutable_test)"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import copy
+import functools
+import json
+import pickle
+import timeit
+
+_ATOMIC = frozenset((str, int, float, bool, type(None)))
+
+
+class _NotJson(Exception):
+    pass
+
+
+def _copy(obj):
+    # Exact type checks: subclasses (OrderedDict, defaultdict, ...) go to copy.deepcopy
+    cls = type(obj)
+    if cls is dict:
+        return {
+            key: value if type(value) in _ATOMIC else _copy(value) for key, value in obj.items()
+        }
+    if cls is list:
+        return [value if type(value) in _ATOMIC else _copy(value) for value in obj]
+    if cls is tuple:
+        return tuple([value if type(value) in _ATOMIC else _copy(value) for value in obj])
+    if cls in _ATOMIC:
+        return obj
+    raise _NotJson(cls)
+
+
+def json_deepcopy(obj, acyclic=True):
+    """Deep copy of dict/list/tuple/str/int/float/bool/None trees without the memo dict
+
+    acyclic=False or any other type inside - copy.deepcopy of the whole tree.
+    Unlike copy.deepcopy, a subtree shared by two parents is copied twice. A cycle passed
+    with acyclic=True ends in RecursionError and is copied by copy.deepcopy after all.
+    A pickle round trip is faster still (C code, see copy_bench), but it copies any
+    picklable object by __reduce__ instead of __deepcopy__ semantics.
+    """
+    if not acyclic:
+        return copy.deepcopy(obj)
+    try:
+        return _copy(obj)
+    except (_NotJson, RecursionError):
+        return copy.deepcopy(obj)
+
+
+def mutable_test():
+    print()
+    a = {1: [1]}
+    b = json_deepcopy(a)
+    a[1].append(2)
+    print("mutable_test dict json_deepcopy a b:", a, b)
+
+    a = {1: [1], 2: {3}}
+    b = json_deepcopy(a)
+    a[2].add(4)
+    print("mutable_test dict with set json_deepcopy a b:", a, b)
+
+    a = {1: [1]}
+    a[1].append(a)
+    b = json_deepcopy(a)
+    print("mutable_test cyclic json_deepcopy b:", b, b[1][1] is b)
+
+
+def _wide(size):
+    return {f"key{i}": [i, str(i), {"flag": i % 2 == 0}] for i in range(size)}
+
+
+def _deep(depth):
+    tree = {"leaf": [1, 2.0, None]}
+    for i in range(depth):
+        tree = {"level": i, "children": [tree]}
+    return tree
+
+
+def _large(size):
+    return [
+        {"id": i, "name": f"user{i}", "tags": ["a", "b"], "geo": {"lat": 1.0, "lon": 2.0}}
+        for i in range(size)
+    ]
+
+
+COPY_FUNCS = {
+    "copy.deepcopy": copy.deepcopy,
+    "json_deepcopy": json_deepcopy,
+    "json loads(dumps)": lambda obj: json.loads(json.dumps(obj)),
+    "pickle loads(dumps)": lambda obj: pickle.loads(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)),
+}
+
+
+def copy_bench(repeat=5):
+    trees = {
+        "wide 10**4 keys": _wide(10 ** 4),
+        "deep 200 levels": _deep(200),
+        "large 10**4 records": _large(10 ** 4),
+        "config 20 keys": _wide(20),
+    }
+    for name, tree in trees.items():
+        print(f"\n{name}:")
+        number = max(1, 10 ** 4 // len(json.dumps(tree)) * 10)
+        base = None
+        for func_name, func in COPY_FUNCS.items():
+            # json keys are str only, skip the comparison for it
+            assert func_name.startswith("json ") or func(tree) == tree
+            timer = timeit.Timer(functools.partial(func, tree))
+            exec_time = min(timer.repeat(repeat, number)) / number
+            base = base or exec_time
+            print(f"    {func_name:20} exec time: {exec_time:.6f} x{base / exec_time:.1f}")
+
+
+def _test():
+    """Test and debug"""
+    mutable_test()
+    copy_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python fast_copy.py
+
+mutable_test dict json_deepcopy a b: {1: [1, 2]} {1: [1]}
+mutable_test dict with set json_deepcopy a b: {1: [1], 2: {3, 4}} {1: [1], 2: {3}}
+mutable_test cyclic json_deepcopy b: {1: [1, {...}]} True
+
+wide 10**4 keys:
+    copy.deepcopy        exec time: 0.047584 x1.0
+    json_deepcopy        exec time: 0.016045 x3.0
+    json loads(dumps)    exec time: 0.023330 x2.0
+    pickle loads(dumps)  exec time: 0.012089 x3.9
+
+deep 200 levels:
+    copy.deepcopy        exec time: 0.000953 x1.0
+    json_deepcopy        exec time: 0.000396 x2.4
+    json loads(dumps)    exec time: 0.000342 x2.8
+    pickle loads(dumps)  exec time: 0.000127 x7.5
+
+large 10**4 records:
+    copy.deepcopy        exec time: 0.100021 x1.0
+    json_deepcopy        exec time: 0.027050 x3.7
+    json loads(dumps)    exec time: 0.032689 x3.1
+    pickle loads(dumps)  exec time: 0.018701 x5.3
+
+config 20 keys:
+    copy.deepcopy        exec time: 0.000063 x1.0
+    json_deepcopy        exec time: 0.000028 x2.3
+    json loads(dumps)    exec time: 0.000047 x1.3
+    pickle loads(dumps)  exec time: 0.000018 x3.5
+"""
@@ -0,0 +1,203 @@
+"""Test fork-aware singleton"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import array
+import copy
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from singletone import (
+    MetaSingleton,
+    MetaSingletonSafe,
+    SingleFactory,
+    SingleInit,
+    SingleMeta,
+    SingleState,
+)
+
+_FORK_RESETS = []
+
+
+def _reset_in_child():
+    for class_def, defaults in _FORK_RESETS:
+        for name, value in defaults.items():
+            setattr(class_def, name, copy.copy(value))
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_in_child)
+
+
+def fork_reset(class_def, **defaults):
+    """Opt-in: in a forked child set class attributes to fresh defaults, _instance=None
+
+    The child gets no parent instances (stale fds, held locks),
+    the singleton is created again on the first call in the child.
+    Defaults are None or empty containers, copied per child: a snapshot of the current
+    value could be the parent's instance itself (copy.copy of a SingleInit is the instance).
+    """
+    for name, value in defaults.items():
+        if value is not None and (type(value) not in (dict, list, set) or value):
+            raise TypeError(f"fork_reset default of {name} is not None or an empty container")
+    _FORK_RESETS.append((class_def, defaults))
+    return class_def
+
+
+def fork_reset_singletone():
+    """Register all singletone.py strategies
+
+    singleton_decor keeps instances in a closure, so SingleDecor cannot be reset from outside.
+    """
+    fork_reset(SingleInit, _instance=None)
+    fork_reset(SingleState, _foo=None)
+    fork_reset(SingleFactory, _instance=None)
+    fork_reset(MetaSingleton, _instances={})
+    fork_reset(MetaSingletonSafe, _instances={}, _locks={})
+
+
+class SharedSingleState:
+    """SingleState with the state in shared memory: N pool workers read one copy
+
+    The parent calls create(values), workers call attach(name, size)
+    (ProcessPoolExecutor initializer) or inherit the mapping on fork.
+    """
+
+    _shm = None
+    _foo = None
+
+    @classmethod
+    def create(cls, values, typecode="d"):
+        data = array.array(typecode, values)
+        cls._shm = shared_memory.SharedMemory(create=True, size=max(len(data) * data.itemsize, 1))
+        cls._foo = cls._shm.buf[: len(data) * data.itemsize].cast(typecode)
+        cls._foo[:] = data
+        return cls._shm.name, len(data)
+
+    @classmethod
+    def attach(cls, name, size, typecode="d"):
+        if cls._shm is not None and cls._shm.name.lstrip("/") == name.lstrip("/"):
+            return  # inherited on fork
+        # Pool workers share the parent resource tracker, only the parent unlinks the segment
+        cls._shm = shared_memory.SharedMemory(name=name)
+        cls._foo = cls._shm.buf[: size * array.array(typecode).itemsize].cast(typecode)
+
+    @classmethod
+    def close(cls, unlink=False):
+        if cls._shm is None:
+            return
+        cls._foo.release()
+        cls._foo = None
+        cls._shm.close()
+        if unlink:
+            cls._shm.unlink()
+        cls._shm = None
+
+    @property
+    def foo(self):
+        return SharedSingleState._foo
+
+
+def fork_test():
+    print()
+    single_meta = SingleMeta()
+    single_meta.foo = 1
+    single_init = SingleInit()
+    print("parent SingleMeta.foo:", SingleMeta().foo)
+
+    sys.stdout.flush()  # do not print the parent buffer twice
+    pid = os.fork()
+    if pid == 0:
+        same = SingleMeta() is single_meta
+        print("child SingleMeta.foo:", SingleMeta().foo, "same object:", same)
+        print("child SingleInit same object:", SingleInit() is single_init)
+        sys.stdout.flush()
+        os._exit(0)  # pylint: disable=protected-access
+    os.waitpid(pid, 0)
+    print("parent SingleMeta.foo:", SingleMeta().foo, "same object:", SingleMeta() is single_meta)
+    try:
+        fork_reset(SingleInit, _instance=single_init)
+    except TypeError as exc:
+        print("fork_reset to an instance:", exc)
+
+
+def _worker_singleton(_i):
+    return os.getpid(), SingleMeta in MetaSingleton._instances  # pylint: disable=protected-access
+
+
+def _worker_sum(bounds):
+    start, stop = bounds
+    return os.getpid(), sum(SharedSingleState().foo[start:stop])
+
+
+def process_pool_test(size=10 ** 6, workers=2):
+    print()
+    sys.stdout.flush()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(workers, mp_context=context) as executor:
+        results = set(executor.map(_worker_singleton, range(workers * 2)))
+        print("pool SingleMeta inherited:", sorted(inherited for _pid, inherited in results))
+
+    name, length = SharedSingleState.create(range(size))
+    try:
+        chunks = [(i * size // 4, (i + 1) * size // 4) for i in range(4)]
+        for method in ("fork", "spawn"):
+            context = multiprocessing.get_context(method)
+            with ProcessPoolExecutor(
+                workers,
+                mp_context=context,
+                initializer=SharedSingleState.attach,
+                initargs=(name, length),
+            ) as executor:
+                total = sum(part for _pid, part in executor.map(_worker_sum, chunks))
+            print(f"pool {method} shared memory sum:", total, "expected:", sum(range(size)))
+    finally:
+        SharedSingleState.close(unlink=True)
+
+
+def _test():
+    """Test and debug"""
+    fork_reset_singletone()
+    fork_test()
+    process_pool_test()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python fork_singleton.py
+func: 1
+func: 1
+func: 3
+SingleVar: init
+SingleVar.foo: <singletone.SingleVar object at 0x7ff09545fed0> 1
+
+SingleMeta: init
+SingleInit: init
+parent SingleMeta.foo: 1
+SingleMeta: init
+child SingleMeta.foo: foo same object: False
+SingleInit: init
+child SingleInit same object: False
+parent SingleMeta.foo: 1 same object: True
+fork_reset to an instance: fork_reset default of _instance is not None or an empty container
+
+pool SingleMeta inherited: [False, False]
+pool fork shared memory sum: 499999500000.0 expected: 499999500000
+func: 1
+func: 1
+func: 3
+SingleVar: init
+SingleVar.foo: <singletone.SingleVar object at 0x7f04d2be24d0> 1
+func: 1
+func: 1
+func: 3
+SingleVar: init
+SingleVar.foo: <singletone.SingleVar object at 0x7fbf409524d0> 1
+pool spawn shared memory sum: 499999500000.0 expected: 499999500000
+"""
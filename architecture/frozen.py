@@ -0,0 +1,240 @@
+"""Hashable frozen forms of lists, dicts and sets for cache keys (dict_key_test)"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import functools
+import json
+import timeit
+
+
+class Frozen:
+    """Immutable canonical form with the hash computed once"""
+
+    __slots__ = ("items", "_hash")
+    _tag = 0
+
+    def __init__(self, items):
+        self.items = items
+        self._hash = hash((self._tag, items))
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._hash == other._hash and self.items == other.items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.items!r})"
+
+
+class FrozenList(Frozen):
+    """[1] - FrozenList((1,)), not equal to the tuple (1,)"""
+
+    __slots__ = ()
+    _tag = 1
+
+
+class FrozenDict(Frozen):
+    """A frozenset of items, so {1: 1, 2: 2} and {2: 2, 1: 1} freeze equal
+
+    Not sorted: sorting frozenset or mixed type keys gives an order that depends on the
+    insertion order, and equal dicts would freeze unequal.
+    """
+
+    __slots__ = ()
+    _tag = 2
+
+
+class FrozenSet(Frozen):
+    __slots__ = ()
+    _tag = 3
+
+
+_ATOMIC = frozenset((str, int, float, bool, bytes, type(None)))
+
+
+def _freeze(obj):
+    # atomic values are checked inline, a call per leaf doubles the cost
+    cls = type(obj)
+    if cls is list:
+        return FrozenList(
+            tuple([value if type(value) in _ATOMIC else _freeze(value) for value in obj])
+        )
+    if cls is dict:
+        return FrozenDict(
+            frozenset(
+                [
+                    (key, value if type(value) in _ATOMIC else _freeze(value))
+                    for key, value in obj.items()
+                ]
+            )
+        )
+    if cls is set or cls is frozenset:
+        return FrozenSet(frozenset([_freeze(value) for value in obj]))
+    if cls is tuple:
+        return tuple([value if type(value) in _ATOMIC else _freeze(value) for value in obj])
+    hash(obj)  # TypeError for other unhashable types
+    return obj
+
+
+def freeze(obj):
+    """Hashable form of obj, built on every call
+
+    Only values that are immutable already (atoms, Frozen) come back as they are: a cache
+    keyed on id() can not see in-place changes of a list or dict.
+    """
+    if type(obj) in _ATOMIC or isinstance(obj, Frozen):
+        return obj
+    return _freeze(obj)
+
+
+def freeze_args(args, kwargs):
+    """Cache key of a call, kwargs order does not matter"""
+    if kwargs:
+        return tuple([freeze(arg) for arg in args]), FrozenDict(
+            frozenset([(key, freeze(value)) for key, value in kwargs.items()])
+        )
+    return tuple([freeze(arg) for arg in args])
+
+
+class _CallKey:
+    """Hashed and compared by the frozen key, carries the original args to the call"""
+
+    __slots__ = ("key", "args", "kwargs", "_hash")
+
+    def __init__(self, args, kwargs):
+        self.key = freeze_args(args, kwargs)
+        self.args = args
+        self.kwargs = kwargs
+        self._hash = hash(self.key)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def frozen_lru_cache(maxsize=128):
+    """functools.lru_cache for functions taking lists and dicts"""
+
+    def decor(func):
+        @functools.lru_cache(maxsize)
+        def cached(call_key):
+            return func(*call_key.args, **call_key.kwargs)
+
+        @functools.wraps(func)
+        def wrap(*args, **kwargs):
+            try:
+                call_key = _CallKey(args, kwargs)
+            except TypeError:
+                return func(*args, **kwargs)
+            return cached(call_key)
+
+        wrap.cache_info = cached.cache_info
+        wrap.cache_clear = cached.cache_clear
+        return wrap
+
+    return decor
+
+
+def dict_key(key):
+    try:
+        print(f"dict_key(freeze({key})):", end=" ")
+        print({freeze(key): 1})
+    except Exception as exc:  # pylint: disable=broad-except
+        print(exc)
+
+
+def dict_key_test():
+    print()
+    dict_key([1])
+    dict_key({1: 1})
+    dict_key({"b": [1, {2}], "a": None})
+    dict_key({1: 1, "1": 1})
+    dict_key([bytearray(b"1")])
+    equal = freeze({1: 1, 2: 2}) == freeze({2: 2, 1: 1})
+    print("freeze({1: 1, 2: 2}) == freeze({2: 2, 1: 1}):", equal)
+    # frozensets are only partially ordered, sorted() of these keys follows insertion order
+    keys = [frozenset({1}), frozenset({2}), frozenset({3})]
+    forward, backward = dict.fromkeys(keys, 0), dict.fromkeys(reversed(keys), 0)
+    print("frozenset keys in two orders freeze equal:", freeze(forward) == freeze(backward))
+    print("freeze([1]) == freeze((1,)):", freeze([1]) == freeze((1,)))
+
+
+def key_bench(number=10 ** 4):
+    """Key construction cost per call"""
+    print()
+    payloads = {
+        "list of 3": [1, 2, 3],
+        "dict of 10": {f"key{i}": i for i in range(10)},
+        "config 100 nested": {f"key{i}": [i, {"x": [i]}] for i in range(100)},
+    }
+    for name, payload in payloads.items():
+        cases = {
+            "json.dumps sort_keys": functools.partial(json.dumps, payload, sort_keys=True),
+            "freeze": functools.partial(freeze, payload),
+            "freeze frozen": functools.partial(freeze, freeze(payload)),
+        }
+        for case, func in cases.items():
+            exec_time = min(timeit.repeat(func, number=number, repeat=5)) / number
+            print(f"{name:18} {case:20} - exec time: {exec_time * 1e6:.2f} us")
+
+
+def lru_test():
+    print()
+
+    @frozen_lru_cache()
+    def total(values, scale=1):
+        return sum(values) * scale
+
+    values = [1, 2, 3]
+    print("total:", total(values), total(values), total([1, 2, 3], scale=1), total.cache_info())
+    values[0] = 100  # same object and length, changed in place
+    print("total after values[0] = 100:", total(values), freeze(values))
+
+
+def _test():
+    """Test and debug"""
+    dict_key_test()
+    lru_test()
+    key_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python frozen.py
+
+dict_key(freeze([1])): {FrozenList((1,)): 1}
+dict_key(freeze({1: 1})): {FrozenDict(frozenset({(1, 1)})): 1}
+dict_key(freeze({'b': [1, {2}], 'a': None})): {FrozenDict(frozenset({('b', FrozenList((1, FrozenSet(frozenset({2}))))), ('a', None)})): 1}
+dict_key(freeze({1: 1, '1': 1})): {FrozenDict(frozenset({(1, 1), ('1', 1)})): 1}
+dict_key(freeze([bytearray(b'1')])): unhashable type: 'bytearray'
+freeze({1: 1, 2: 2}) == freeze({2: 2, 1: 1}): True
+frozenset keys in two orders freeze equal: True
+freeze([1]) == freeze((1,)): False
+
+total: 6 6 6 CacheInfo(hits=1, misses=2, maxsize=128, currsize=2)
+total after values[0] = 100: 105 FrozenList((100, 2, 3))
+
+list of 3          json.dumps sort_keys - exec time: 2.51 us
+list of 3          freeze               - exec time: 0.73 us
+list of 3          freeze frozen        - exec time: 0.08 us
+dict of 10         json.dumps sort_keys - exec time: 5.11 us
+dict of 10         freeze               - exec time: 1.82 us
+dict of 10         freeze frozen        - exec time: 0.09 us
+config 100 nested  json.dumps sort_keys - exec time: 109.08 us
+config 100 nested  freeze               - exec time: 369.96 us
+config 100 nested  freeze frozen        - exec time: 0.12 us
+"""
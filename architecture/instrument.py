@@ -0,0 +1,359 @@
+"""Hot path instrumentation: call counts and log2 latency histograms instead of print_exec_time"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import collections
+import contextlib
+import functools
+import gc
+import json
+import threading
+import time
+import timeit
+import weakref
+
+
+class FuncStats:
+    """Histogram of sampled latencies, bucket k counts [2**(k-1), 2**k) ns
+
+    Nodes of a call tree, children are nested spans. Calls are counted per thread
+    in Instrumentation, so unsampled calls take no lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sampled = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * 64
+        self.children = {}
+
+    def child(self, name):
+        try:
+            return self.children[name]
+        except KeyError:
+            with self.lock:
+                return self.children.setdefault(name, FuncStats())
+
+    def record(self, exec_ns):
+        with self.lock:
+            self.sampled += 1
+            self.total_ns += exec_ns
+            if exec_ns > self.max_ns:
+                self.max_ns = exec_ns
+            self.buckets[min(exec_ns.bit_length(), 63)] += 1
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the percentile"""
+        rank = self.sampled * percent / 100
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return 2 ** bucket
+        return 0
+
+    def to_dict(self, calls):
+        with self.lock:
+            return {
+                "calls": calls,
+                "sampled": self.sampled,
+                "mean_ns": self.total_ns / self.sampled if self.sampled else 0,
+                "max_ns": self.max_ns,
+                "p50_ns": self.percentile(50),
+                "p99_ns": self.percentile(99),
+                "buckets": {2 ** k: count for k, count in enumerate(self.buckets) if count},
+            }
+
+    def walk(self, prefix=""):
+        for name, node in sorted(self.children.items()):
+            path = prefix + name
+            yield path, node
+            yield from node.walk(path + "/")
+
+
+class _ThreadState:
+    """One per thread, kept across resets: the stack is swapped for the new root at top level
+
+    calls is written only by its own thread. skipping - inside a call tree that is not sampled.
+    """
+
+    __slots__ = ("stack", "calls", "countdown", "skipping", "__weakref__")
+
+    def __init__(self, root):
+        self.stack = [root]
+        self.calls = {}  # node: calls
+        self.countdown = 1  # the first call tree is sampled
+        self.skipping = False
+
+
+class _Totals:
+    """The current tree and the calls of finished threads, swapped in place by reset"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.root = FuncStats()
+        self.done_calls = collections.Counter()
+
+    def fold(self, state):
+        # a finished thread's calls are merged into one counter, not kept per thread
+        with self.lock:
+            if state.stack[0] is self.root:
+                self.done_calls.update(state.calls)
+
+
+class Instrumentation:
+    """@instrument or with span("name"), nested spans are keyed as "outer/inner"
+
+    Disabled - one attribute check per call. sample_every=N - 1 in N top level call trees
+    is recorded, nested calls included; the others skip the clock, the span stack and the
+    counters, so calls are estimated as recorded calls * N. Per call in overhead_test:
+    plain 40 ns, disabled 200 ns, recorded 2 us, sample_every=100 0.6 us - for functions of
+    tens of microseconds and up, not for tight loops.
+    """
+
+    def __init__(self, enabled=True, sample_every=1):
+        self.enabled = enabled
+        self.sample_every = sample_every
+        self._totals = _Totals()
+        self._threads = weakref.WeakKeyDictionary()  # thread: _ThreadState of the live ones
+        self._local = threading.local()
+
+    def _thread_state(self):
+        """Registered once per thread, its finalizer folds the calls when the thread is gone"""
+        totals = self._totals
+        state = self._local.state = _ThreadState(totals.root)
+        thread = threading.current_thread()
+        with totals.lock:
+            self._threads[thread] = state
+        weakref.finalize(thread, totals.fold, state)
+        return state
+
+    def _enter(self, name):
+        """None inside a skipped tree, (state, None, None) for a skipped top level call,
+        else (state, node, start time)"""
+        try:
+            state = self._local.state
+        except AttributeError:
+            state = self._thread_state()
+        if state.skipping:
+            return None
+        stack = state.stack
+        if len(stack) == 1:
+            state.countdown -= 1
+            if state.countdown > 0:
+                state.skipping = True
+                return state, None, None
+            state.countdown = self.sample_every
+            root = self._totals.root
+            if stack[0] is not root:  # reset since the last call tree
+                stack = state.stack = [root]
+                state.calls = {}
+        parent = stack[-1]
+        node = parent.children.get(name) or parent.child(name)
+        stack.append(node)
+        calls = state.calls
+        calls[node] = calls.get(node, 0) + self.sample_every
+        return state, node, time.perf_counter_ns()
+
+    @staticmethod
+    def _exit(token):
+        if token is None:
+            return
+        state, node, start_ns = token
+        if node is None:
+            state.skipping = False
+            return
+        node.record(time.perf_counter_ns() - start_ns)
+        state.stack.pop()
+
+    def instrument(self, func=None, *, name=None, by_kwargs=False):
+        """by_kwargs=True - separate stats per set of kwarg names, func[timeout,retries]"""
+        if func is None:
+            return functools.partial(self.instrument, name=name, by_kwargs=by_kwargs)
+        name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrap(*arg, **kwarg):
+            if not self.enabled:
+                return func(*arg, **kwarg)
+            key = f"{name}[{','.join(sorted(kwarg))}]" if by_kwargs and kwarg else name
+            token = self._enter(key)
+            try:
+                return func(*arg, **kwarg)
+            finally:
+                self._exit(token)
+
+        return wrap
+
+    @contextlib.contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        token = self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit(token)
+
+    def snapshot(self, reset=False):
+        """Threads inside a call tree keep reporting into the old tree after reset"""
+        totals = self._totals
+        with totals.lock:
+            root = totals.root
+            per_thread = [state.calls for state in self._threads.values() if state.stack[0] is root]
+            done_calls = totals.done_calls
+            if reset:
+                totals.root = FuncStats()
+                totals.done_calls = collections.Counter()
+            else:
+                done_calls = collections.Counter(done_calls)
+        return {
+            path: node.to_dict(done_calls[node] + sum(calls.get(node, 0) for calls in per_thread))
+            for path, node in root.walk()
+        }
+
+    def start_dumper(self, interval, path=None, callback=None, reset=False):
+        """Every interval seconds append a JSON line to path and/or call callback(snapshot)
+
+        Returns threading.Event, set() it to stop.
+        """
+        stop = threading.Event()
+
+        def dump():
+            while not stop.wait(interval):
+                snapshot = {"time": time.time(), "stats": self.snapshot(reset)}
+                if path:
+                    with open(path, "a", encoding="utf-8") as file:
+                        file.write(json.dumps(snapshot) + "\n")
+                if callback:
+                    callback(snapshot)
+
+        threading.Thread(target=dump, name="instrument-dumper", daemon=True).start()
+        return stop
+
+
+INSTRUMENTATION = Instrumentation(enabled=False)
+instrument = INSTRUMENTATION.instrument
+span = INSTRUMENTATION.span
+
+
+@instrument
+def if_is(foo):
+    for _i in range(10 ** 3):
+        if foo is None:
+            pass
+
+
+@instrument(by_kwargs=True)
+def func_str2(str_len, count=10 ** 3):
+    return "".join("q" * str_len for _i in range(count))
+
+
+def print_snapshot(snapshot):
+    for name, stats in snapshot.items():
+        print(
+            f"{name}: calls {stats['calls']} sampled {stats['sampled']}",
+            f"mean {stats['mean_ns']:.0f} ns",
+            f"p50 < {stats['p50_ns']} ns p99 < {stats['p99_ns']} ns",
+        )
+
+
+def spans_test():
+    print()
+    INSTRUMENTATION.enabled = True
+    with span("request"):
+        for _i in range(10):
+            if_is(None)
+        with span("render"):
+            func_str2(10)
+            func_str2(10, count=10 ** 4)
+    print_snapshot(INSTRUMENTATION.snapshot(reset=True))
+
+    snapshots = []
+    stop = INSTRUMENTATION.start_dumper(0.05, callback=snapshots.append)
+    for _i in range(100):
+        if_is([])
+        time.sleep(0.002)
+    stop.set()
+    print("dumper snapshots:", len(snapshots))
+    INSTRUMENTATION.enabled = False
+    INSTRUMENTATION.snapshot(reset=True)
+
+
+def threads_test(n_threads=20, number=5):
+    print()
+    instrumentation = Instrumentation()
+    wrapped = instrumentation.instrument(if_is.__wrapped__)
+    threads = [
+        threading.Thread(target=lambda: [wrapped(None) for _i in range(number)])
+        for _i in range(n_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    del threads, thread
+    gc.collect()
+    snapshot = instrumentation.snapshot()
+    print(f"if_is from {n_threads} threads - calls:", snapshot["if_is"]["calls"], end=" ")
+    print("thread states kept:", len(instrumentation._threads))
+
+    # one live thread across resets, as with start_dumper(reset=True): one state, one finalizer
+    for _i in range(100):
+        wrapped(None)
+        instrumentation.snapshot(reset=True)
+    wrapped(None)
+    snapshot = instrumentation.snapshot()
+    print("after 100 resets - calls:", snapshot["if_is"]["calls"], end=" ")
+    print("thread states kept:", len(instrumentation._threads))
+
+
+def overhead_test(number=10 ** 5):
+    print()
+
+    def noop():
+        pass
+
+    exec_time = min(timeit.repeat(noop, number=number, repeat=5))
+    print("plain - ns per call:", exec_time / number * 1e9)
+    for enabled, sample_every in ((False, 1), (True, 1), (True, 100)):
+        instrumentation = Instrumentation(enabled, sample_every)
+        wrapped = instrumentation.instrument(noop)
+        exec_time = min(timeit.repeat(wrapped, number=number, repeat=5))
+        print(
+            f"enabled={enabled} sample_every={sample_every} - ns per call:",
+            exec_time / number * 1e9,
+        )
+
+
+def _test():
+    """Test and debug"""
+    spans_test()
+    threads_test()
+    overhead_test()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python instrument.py
+
+request: calls 1 sampled 1 mean 2174277 ns p50 < 4194304 ns p99 < 4194304 ns
+request/if_is: calls 10 sampled 10 mean 28886 ns p50 < 32768 ns p99 < 65536 ns
+request/render: calls 1 sampled 1 mean 1801963 ns p50 < 2097152 ns p99 < 2097152 ns
+request/render/func_str2: calls 1 sampled 1 mean 152386 ns p50 < 262144 ns p99 < 262144 ns
+request/render/func_str2[count]: calls 1 sampled 1 mean 1585031 ns p50 < 2097152 ns p99 < 2097152 ns
+dumper snapshots: 4
+
+if_is from 20 threads - calls: 100 thread states kept: 0
+after 100 resets - calls: 1 thread states kept: 1
+
+plain - ns per call: 41.52404000706156
+enabled=False sample_every=1 - ns per call: 201.6709899999114
+enabled=True sample_every=1 - ns per call: 1984.9188000080173
+enabled=True sample_every=100 - ns per call: 630.8695600000647
+"""
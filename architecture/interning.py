@@ -0,0 +1,299 @@
+"""Interning (hash-consing): one shared instance per equal value, so `is` works (is_equal_test)"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import dataclasses
+import functools
+import gc
+import sys
+import timeit
+import tracemalloc
+import weakref
+
+
+_SCALARS = frozenset((int, float, bool, type(None)))
+_FLAT = _SCALARS | {str, bytes, complex}
+
+
+@functools.lru_cache(maxsize=None)
+def _field_names(cls):
+    """Field names of a frozen dataclass, None for other classes: mutable records never alias"""
+    if not dataclasses.is_dataclass(cls) or not cls.__dataclass_params__.frozen:
+        return None
+    return tuple([field.name for field in dataclasses.fields(cls)])
+
+
+def _typed_key(value):
+    """Equal values of different types are different keys: True, 1 and 1.0, (True, 2) and (1, 2)"""
+    cls = type(value)
+    if cls in _FLAT:
+        return cls, value
+    if cls is tuple:
+        types = tuple(map(type, value))
+        if _FLAT.issuperset(types):
+            return types, value  # no nested values to tell apart, the common case
+        return cls, tuple([_typed_key(item) for item in value])
+    if cls is frozenset:
+        return cls, frozenset([_typed_key(item) for item in value])
+    names = _field_names(cls)
+    if names is not None:
+        return cls, tuple([_typed_key(getattr(value, name)) for name in names])
+    return cls, value
+
+
+class InternTable:
+    """Canonical instance per value of the same type, equal values of other types kept apart
+
+    str - sys.intern, CPython's own table.
+    Weakly referenceable values (frozen dataclasses, frozensets, ...) - a dict of weakrefs,
+    an entry goes away with the last outside reference. Frozensets and frozen dataclasses
+    are keyed by the typed keys of their items, other objects by type and equality only.
+    tuple/int/float/bytes can not be weakly referenced - a strong dict, unbounded by default.
+    With maxsize the oldest entry is dropped first, and `is` holds only within the last
+    maxsize values: one interned again after its entry is dropped is a new canonical.
+    Unhashable values and mutable dataclasses are returned unchanged, never shared.
+    deep=True interns tuple items first (but int/float/bool/None), so nested tuples and
+    strings are shared too.
+    """
+
+    def __init__(self, deep=True, maxsize=None):
+        self.deep = deep
+        self.maxsize = maxsize
+        self._strong = {}
+        weak = self._weak = {}
+
+        def remove(ref, key):
+            if weak.get(key) is ref:  # the key may hold a newer canonical by now
+                del weak[key]
+
+        self._remove = remove
+
+    def intern(self, value):
+        cls = type(value)
+        if cls is str:
+            return sys.intern(value)
+        if cls.__hash__ is None:
+            return value
+        if cls.__weakrefoffset__:
+            return self._intern_weak(value)
+        if cls is tuple and self.deep:
+            value = self._intern_items(value)
+        table = self._strong
+        try:
+            canonical = table.setdefault(_typed_key(value), value)
+        except TypeError:  # an unhashable item, (1, [2])
+            return value
+        if canonical is value and self.maxsize is not None and len(table) > self.maxsize:
+            del table[next(iter(table))]
+        return canonical
+
+    def _intern_items(self, value):
+        """The same tuple back when its items are canonical already, no allocation"""
+        items = None
+        for index, item in enumerate(value):
+            cls = type(item)
+            if cls in _SCALARS:
+                continue
+            canonical = sys.intern(item) if cls is str else self.intern(item)
+            if canonical is not item:
+                if items is None:
+                    items = list(value)
+                items[index] = canonical
+        return value if items is None else tuple(items)
+
+    def _intern_weak(self, value):
+        cls = type(value)
+        if cls is frozenset or _field_names(cls) is not None:
+            key = _typed_key(value)
+        elif dataclasses.is_dataclass(cls):
+            return value  # not frozen, equal today is not equal tomorrow
+        else:
+            key = cls, weakref.ref(value)  # a weakref hashes and compares as its referent
+        try:
+            ref = self._weak.get(key)
+        except TypeError:  # a frozen dataclass holding a list
+            return value
+        if ref is not None:
+            canonical = ref()
+            if canonical is not None:
+                return canonical
+        self._weak[key] = weakref.ref(value, lambda ref, key=key: self._remove(ref, key))
+        return value
+
+    def clear(self):
+        self._strong.clear()
+        self._weak.clear()
+
+    def __len__(self):
+        return len(self._strong) + len(self._weak)
+
+
+_TABLE = InternTable()
+intern = _TABLE.intern
+
+
+@dataclasses.dataclass(frozen=True)
+class Record:
+    """Frozen record, weakly referenceable (no __slots__), so interned in the weak table"""
+
+    name: str
+    count: int
+
+
+@dataclasses.dataclass
+class MutableRecord:
+    name: str
+    count: int
+
+
+def is_intern_test():
+    print()
+    table = InternTable(maxsize=4)
+    # built at run time, equal literals in one function would be one constant already
+    for make in (lambda: tuple([1, "a"]), lambda: Record("a", 1), lambda: "".join(["a"] * 10)):
+        a, b = make(), make()
+        a_interned, b_interned = table.intern(a), table.intern(b)
+        print(f"is_intern {a!r}: a is b {a is b},", end=" ")
+        print(f"intern(a) is intern(b) {a_interned is b_interned}")
+        print("table size:", len(table))  # the Record entry goes away once a and b are rebound
+    del a, b, a_interned, b_interned
+    gc.collect()
+    print("table size after del:", len(table))
+
+    nested = table.intern((("tag", "1"), 2))
+    print("deep:", nested[0] is table.intern(("tag", "1")))
+
+    # equal, but not the same value: 1 == 1.0 == True
+    values = [1, 1.0, True, (1, 2), (True, 2), Record("a", 1), Record("a", True)]
+    print("typed:", [table.intern(value) for value in values])
+    for value in range(4):  # four newer entries push (1, 2) out
+        table.intern((value,))
+    print("strong table of maxsize 4 - size:", len(table._strong), "oldest dropped:", end=" ")
+    print(_typed_key((1, 2)) not in table._strong, end=" ")
+    # `is` holds only within the last maxsize values: (1, 2) is a new canonical now
+    print("intern((1, 2)) is the first canonical:", table.intern(tuple([1, 2])) is values[3])
+
+    # mutable or unhashable - returned as is, two equal MutableRecord stay two objects
+    a, b = MutableRecord("a", 1), MutableRecord("a", 1)
+    print("mutable:", table.intern(a) is a, table.intern(b) is b, end=" ")
+    unhashable = (1, [2])
+    print("unhashable:", table.intern(unhashable) is unhashable, table.intern([1]) == [1])
+
+
+def _records(size, unique):
+    """Fresh objects per row, only unique of them distinct by value"""
+    return ((f"user{i % unique}", i % unique, ("tag", str(i % unique))) for i in range(size))
+
+
+def _traced(func):
+    gc.collect()
+    tracemalloc.start()
+    ret = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ret, current, peak
+
+
+def memory_bench(size=10 ** 6, unique=10 ** 3):
+    """Memory of size rows with heavy duplication, the tables included"""
+    print()
+    table = InternTable()
+    seen = {}
+    cases = {
+        "no interning": lambda: list(_records(size, unique)),
+        "dict setdefault": lambda: [seen.setdefault(row, row) for row in _records(size, unique)],
+        "InternTable": lambda: [table.intern(row) for row in _records(size, unique)],
+    }
+    for name, func in cases.items():
+        rows, current, peak = _traced(func)
+        print(
+            f"{name:16} {size} rows, {unique} unique - current: {current / 2 ** 20:.1f} MiB",
+            f"per row: {current / size:.1f} bytes, peak: {peak / 2 ** 20:.1f} MiB",
+        )
+        del rows
+
+
+def lookup_bench(size=10 ** 5, unique=10 ** 3, repeat=5):
+    """ns per intern() call on prebuilt duplicated rows, hits but the first unique"""
+    print()
+    strings = [f"user{i % unique}" for i in range(size)]
+    tuples = list(_records(size, unique))
+    records = [Record(f"user{i % unique}", i % unique) for i in range(size)]
+    cases = {
+        "str sys.intern": (sys.intern, strings),
+        "str InternTable": (InternTable().intern, strings),
+        "tuple dict setdefault": ({}.setdefault, tuples),
+        "tuple shallow": (InternTable(deep=False).intern, tuples),
+        "tuple deep": (InternTable().intern, tuples),
+        "Record weak": (InternTable().intern, records),
+    }
+    for name, (func, rows) in cases.items():
+        if name.endswith("setdefault"):
+            run = lambda func=func, rows=rows: [func(row, row) for row in rows]
+        else:
+            run = lambda func=func, rows=rows: [func(row) for row in rows]
+        exec_time = min(timeit.repeat(run, number=1, repeat=repeat))
+        print(f"{name:22} - ns per intern: {exec_time / size * 1e9:.1f}")
+
+
+def equal_bench(size=10 ** 5, width=100, repeat=5):
+    """Counting rows equal to a target: == over equal copies vs `is` over interned rows"""
+    print()
+    table = InternTable()
+    rows = [tuple(range(width)) for _i in range(size)]
+    interned = [table.intern(row) for row in rows]
+    target = tuple(range(width))
+    interned_target = table.intern(target)
+    cases = {
+        "== copies": lambda: sum(1 for row in rows if row == target),
+        "== interned": lambda: sum(1 for row in interned if row == interned_target),
+        "is interned": lambda: sum(1 for row in interned if row is interned_target),
+    }
+    for name, func in cases.items():
+        assert func() == size
+        exec_time = min(timeit.repeat(func, number=1, repeat=repeat))
+        print(f"{name:12} tuples of {width} - ns per compare: {exec_time / size * 1e9:.1f}")
+
+
+def _test():
+    """Test and debug"""
+    is_intern_test()
+    memory_bench()
+    lookup_bench()
+    equal_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python interning.py
+
+is_intern (1, 'a'): a is b False, intern(a) is intern(b) True
+table size: 1
+is_intern Record(name='a', count=1): a is b False, intern(a) is intern(b) True
+table size: 2
+is_intern 'aaaaaaaaaa': a is b False, intern(a) is intern(b) True
+table size: 1
+table size after del: 1
+deep: True
+typed: [1, 1.0, True, (1, 2), (True, 2), Record(name='a', count=1), Record(name='a', count=True)]
+strong table of maxsize 4 - size: 4 oldest dropped: True intern((1, 2)) is the first canonical: False
+mutable: True True unhashable: True True
+
+no interning     1000000 rows, 1000 unique - current: 248.0 MiB per row: 260.0 bytes, peak: 248.0 MiB
+dict setdefault  1000000 rows, 1000 unique - current: 8.3 MiB per row: 8.7 bytes, peak: 8.3 MiB
+InternTable      1000000 rows, 1000 unique - current: 9.0 MiB per row: 9.5 bytes, peak: 9.0 MiB
+
+str sys.intern         - ns per intern: 84.7
+str InternTable        - ns per intern: 186.7
+tuple dict setdefault  - ns per intern: 192.0
+tuple shallow          - ns per intern: 3283.5
+tuple deep             - ns per intern: 6672.2
+Record weak            - ns per intern: 2334.6
+
+== copies    tuples of 100 - ns per compare: 390.7
+== interned  tuples of 100 - ns per compare: 361.5
+is interned  tuples of 100 - ns per compare: 44.0
+"""
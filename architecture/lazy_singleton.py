@@ -0,0 +1,193 @@
+"""Test lazy singleton"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import timeit
+
+from singletone import SingleDecor, SingleInit, SingleMeta, SingleVar
+
+
+class LazySingleton:
+    """Proxy which calls factory(*args, **kwargs) on the first attribute access
+
+    SINGLE_VAR = LazySingleton(SingleVar) costs nothing at import time,
+    isinstance(SINGLE_VAR, SingleVar) and SINGLE_VAR.foo = 1 work as usual.
+    """
+
+    __slots__ = ("_lazy_factory", "_lazy_args", "_lazy_class", "_lazy_instance", "_lazy_lock")
+
+    def __init__(self, factory, *args, **kwargs):
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_args", (args, kwargs))
+        # singleton_decor hides the class behind a function, so it is known only after the call
+        object.__setattr__(self, "_lazy_class", factory if isinstance(factory, type) else None)
+        object.__setattr__(self, "_lazy_instance", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_get(self):
+        instance = self._lazy_instance
+        if instance is None:
+            with self._lazy_lock:
+                instance = self._lazy_instance
+                if instance is None:
+                    args, kwargs = self._lazy_args
+                    instance = self._lazy_factory(*args, **kwargs)
+                    object.__setattr__(self, "_lazy_instance", instance)
+        return instance
+
+    # isinstance() checks obj.__class__ as well as type(obj)
+    @property
+    def __class__(self):
+        if self._lazy_class is not None:
+            return self._lazy_class
+        return type(self._lazy_get())
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._lazy_get(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._lazy_get(), name)
+
+    def __dir__(self):
+        return dir(self._lazy_get())
+
+    def __repr__(self):
+        if self._lazy_instance is None:
+            return f"<LazySingleton of {self._lazy_factory!r}, not created>"
+        return repr(self._lazy_instance)
+
+
+def is_created(proxy):
+    return proxy._lazy_instance is not None  # pylint: disable=protected-access
+
+
+LAZY_SINGLE_VAR = LazySingleton(SingleVar)
+LAZY_SINGLE_INIT = LazySingleton(SingleInit)
+LAZY_SINGLE_META = LazySingleton(SingleMeta)
+LAZY_SINGLE_DECOR = LazySingleton(SingleDecor)
+
+
+def _test_lazy(proxy, class_def):
+    print()
+    print(f"{proxy!r} created:", is_created(proxy))
+    proxy.foo = 1
+    print(f"{class_def}.foo:", proxy, proxy.foo, "created:", is_created(proxy))
+    print(f"isinstance(proxy, {class_def.__name__}):", isinstance(proxy, class_def))
+
+
+_IMPORT_TEMPLATE = """
+from lazy_singleton import LazySingleton
+
+
+class Heavy:
+    def __init__(self, size):
+        self.table = {{i: str(i) for i in range(size)}}
+
+
+HEAVY_1 = {create}
+HEAVY_2 = {create}
+HEAVY_3 = {create}
+HEAVY_4 = {create}
+"""
+
+
+def _write_module(path, name, create):
+    with open(os.path.join(path, name + ".py"), "w", encoding="utf-8") as file:
+        file.write(_IMPORT_TEMPLATE.format(create=create))
+
+
+def _import_time(path, name, repeat):
+    code = (
+        "import timeit, lazy_singleton; t = timeit.default_timer(); "
+        f"import {name}; print(timeit.default_timer() - t)"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([path, os.path.dirname(__file__)]))
+    times = []
+    for _i in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True
+        ).stdout
+        times.append(float(output.split()[-1]))
+    return statistics.median(times)
+
+
+def import_time_test(repeat=5):
+    """Import-time of a module with 4 heavy singletons, eager vs LazySingleton"""
+    print()
+    with tempfile.TemporaryDirectory() as path:
+        for size in (10 ** 3, 10 ** 5, 10 ** 6):
+            _write_module(path, f"eager_{size}", f"Heavy({size})")
+            _write_module(path, f"lazy_{size}", f"LazySingleton(Heavy, {size})")
+            eager = _import_time(path, f"eager_{size}", repeat)
+            lazy = _import_time(path, f"lazy_{size}", repeat)
+            print(f"import 4 singletons of size {size} - eager: {eager:.4f} lazy: {lazy:.4f}")
+
+    # Once created, every access goes through __getattr__,
+    # so keep a direct reference in hot loops
+    print()
+    proxy = LazySingleton(SingleVar)
+    proxy.foo = 1
+    instance = SingleVar()
+    print("attr get - direct:", min(timeit.repeat(lambda: instance.foo, number=10 ** 5)))
+    print("attr get - lazy proxy:", min(timeit.repeat(lambda: proxy.foo, number=10 ** 5)))
+
+
+def _test():
+    """Test and debug"""
+    _test_lazy(LAZY_SINGLE_VAR, SingleVar)
+    _test_lazy(LAZY_SINGLE_INIT, SingleInit)
+    _test_lazy(LAZY_SINGLE_META, SingleMeta)
+    _test_lazy(LAZY_SINGLE_DECOR, type(SingleDecor()))
+    import_time_test()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python lazy_singleton.py
+func: 1
+func: 1
+func: 3
+SingleVar: init
+SingleVar.foo: <singletone.SingleVar object at 0x7f6021f98fd0> 1
+
+<LazySingleton of <class 'singletone.SingleVar'>, not created> created: False
+SingleVar: init
+<class 'singletone.SingleVar'>.foo: <singletone.SingleVar object at 0x7f6021f99910> 1 created: True
+isinstance(proxy, SingleVar): True
+
+<LazySingleton of <class 'singletone.SingleInit'>, not created> created: False
+SingleInit: init
+<class 'singletone.SingleInit'>.foo: <singletone.SingleInit object at 0x7f6021f99990> 1 created: True
+isinstance(proxy, SingleInit): True
+
+<LazySingleton of <class 'singletone.SingleMeta'>, not created> created: False
+SingleMeta: init
+<class 'singletone.SingleMeta'>.foo: <singletone.SingleMeta object at 0x7f6021f999d0> 1 created: True
+isinstance(proxy, SingleMeta): True
+SingleDecor: init
+
+<LazySingleton of <function singleton_decor.<locals>.get_instance at 0x7f602224dda0>, not created> created: False
+<class 'singletone.SingleDecor'>.foo: <singletone.SingleDecor object at 0x7f6021f99a50> 1 created: True
+isinstance(proxy, SingleDecor): True
+
+import 4 singletons of size 1000 - eager: 0.0009 lazy: 0.0005
+import 4 singletons of size 100000 - eager: 0.1155 lazy: 0.0005
+import 4 singletons of size 1000000 - eager: 1.0972 lazy: 0.0004
+
+SingleVar: init
+SingleVar: init
+attr get - direct: 0.008719485000028726
+attr get - lazy proxy: 0.08818105500000684
+"""
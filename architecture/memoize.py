@@ -0,0 +1,375 @@
+"""Memoization with LRU/TTL, single-flight and stats, a grown-up func.foo (singletone.py)"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import functools
+import threading
+import time
+import timeit
+
+from frozen import freeze_args
+
+_KWARGS_MARK = object()
+_FAST_TYPES = frozenset((int, str))
+
+
+class _Entry:
+    """hits is the only write on a hit: stats and the CLOCK reference bit (hits != seen)"""
+
+    __slots__ = ("value", "expires", "duration", "hits", "seen")
+
+    def __init__(self, value, expires, duration):
+        self.value = value
+        self.expires = expires
+        self.duration = duration
+        self.hits = 0
+        self.seen = 0
+
+
+class _Pending:
+    """stale - invalidated while computed: the waiters get the value, the cache does not"""
+
+    __slots__ = ("event", "value", "error", "duration", "stale")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.duration = 0.0
+        self.stale = False
+
+
+def _make_key(args, kwargs):
+    if kwargs:
+        return args + (_KWARGS_MARK,) + tuple(kwargs.items())
+    if len(args) == 1 and type(args[0]) in _FAST_TYPES:
+        return args[0]
+    return args
+
+
+def _hashable_key(args, kwargs):
+    key = _make_key(args, kwargs)
+    try:
+        hash(key)
+    except TypeError:
+        key = freeze_args(args, kwargs)  # lists and dicts in args
+    return key
+
+
+class _Cache:
+    """Everything but the hit path, under one lock
+
+    Eviction is CLOCK (second chance), an LRU approximation that needs no reordering
+    on hits. Concurrent misses of one key wait for a single computation, errors are
+    raised to all the waiters and not cached.
+    """
+
+    def __init__(self, func, maxsize, ttl):
+        self.func = func
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        # totals of the evicted entries, live ones are summed in stats()
+        self.totals = dict.fromkeys(("hits", "misses", "evictions", "expired", "invalidated"), 0)
+        self.totals["time_saved"] = 0.0
+
+    def _alive(self, entry):
+        return entry.expires is None or entry.expires > time.monotonic()
+
+    def _drop(self, entry, reason):
+        self.totals["hits"] += entry.hits
+        self.totals["time_saved"] += entry.hits * entry.duration
+        self.totals[reason] += 1
+
+    def miss(self, key, args, kwargs):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self._alive(entry):
+                entry.hits += 1
+                return entry.value
+            pending = self.pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self.pending[key] = _Pending()
+                self.totals["misses"] += 1
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            with self.lock:
+                self.totals["hits"] += 1
+                self.totals["time_saved"] += pending.duration
+            return pending.value
+
+        start_time = time.perf_counter()
+        try:
+            value = self.func(*args, **kwargs)
+        except BaseException as exc:
+            pending.error = exc
+            with self.lock:
+                del self.pending[key]
+            pending.event.set()
+            raise
+        duration = time.perf_counter() - start_time
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            if not pending.stale:
+                old = self.entries.pop(key, None)
+                if old is not None:
+                    self._drop(old, "expired")
+                self.entries[key] = _Entry(value, expires, duration)
+                self._evict()
+            del self.pending[key]
+        pending.value = value
+        pending.duration = duration
+        pending.event.set()
+        return value
+
+    def _evict(self):
+        """CLOCK: entries hit since the last sweep get a second chance at the tail"""
+        entries = self.entries
+        if self.maxsize is None:
+            return
+        while len(entries) > self.maxsize:
+            key = next(iter(entries))
+            entry = entries.pop(key)
+            if not self._alive(entry):
+                self._drop(entry, "expired")
+            elif entry.hits != entry.seen:
+                entry.seen = entry.hits
+                entries[key] = entry
+            else:
+                self._drop(entry, "evictions")
+
+    def invalidate(self, *args, **kwargs):
+        key = _hashable_key(args, kwargs)
+        with self.lock:
+            pending = self.pending.get(key)
+            if pending is not None:
+                pending.stale = True
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self._drop(entry, "invalidated")
+            return entry is not None
+
+    def clear(self):
+        with self.lock:
+            for pending in self.pending.values():
+                pending.stale = True
+            for entry in self.entries.values():
+                self._drop(entry, "invalidated")
+            self.entries.clear()
+
+    def stats(self):
+        """Hit counters are not atomic, under heavy thread contention they are approximate"""
+        with self.lock:
+            stats = dict(self.totals)
+            for entry in self.entries.values():
+                stats["hits"] += entry.hits
+                stats["time_saved"] += entry.hits * entry.duration
+            stats["size"] = len(self.entries)
+            return stats
+
+
+def memoize(func=None, *, maxsize=128, ttl=None):
+    """@memoize or @memoize(maxsize=1024, ttl=60), maxsize=None - unbounded
+
+    Hits take no lock: a dict lookup, a TTL check when ttl is set and one counter.
+    """
+    if func is None:
+        return functools.partial(memoize, maxsize=maxsize, ttl=ttl)
+    cache = _Cache(func, maxsize, ttl)
+    entries_get = cache.entries.get
+    miss = cache.miss
+    monotonic = time.monotonic
+    fast_types = _FAST_TYPES
+
+    if ttl is None:
+
+        @functools.wraps(func)
+        def wrap(*args, **kwargs):
+            if kwargs:
+                key = _make_key(args, kwargs)
+            elif len(args) == 1 and type(args[0]) in fast_types:
+                key = args[0]
+            else:
+                key = args
+            try:
+                entry = entries_get(key)
+            except TypeError:
+                key = freeze_args(args, kwargs)
+                entry = entries_get(key)
+            if entry is not None:
+                entry.hits += 1
+                return entry.value
+            return miss(key, args, kwargs)
+
+    else:
+
+        @functools.wraps(func)
+        def wrap(*args, **kwargs):
+            if kwargs:
+                key = _make_key(args, kwargs)
+            elif len(args) == 1 and type(args[0]) in fast_types:
+                key = args[0]
+            else:
+                key = args
+            try:
+                entry = entries_get(key)
+            except TypeError:
+                key = freeze_args(args, kwargs)
+                entry = entries_get(key)
+            if entry is not None and entry.expires > monotonic():
+                entry.hits += 1
+                return entry.value
+            return miss(key, args, kwargs)
+
+    wrap.cache_stats = cache.stats
+    wrap.cache_invalidate = cache.invalidate
+    wrap.cache_clear = cache.clear
+    return wrap
+
+
+# func.foo from singletone.py, but keyed by param
+@memoize(maxsize=2)
+def func(param):
+    print("func: compute", param)
+    return param
+
+
+def memoize_test():
+    print()
+    func(1)
+    func(1)
+    func(2)
+    func(3)  # evicts 2, 1 was hit and gets a second chance
+    func(1)
+    print("func stats:", func.cache_stats())
+    print("func invalidate(3):", func.cache_invalidate(3))
+
+    @memoize(ttl=0.05)
+    def ttl_func(values):
+        print("ttl_func: compute", values)
+        return sum(values)
+
+    ttl_func([1, 2])
+    ttl_func([1, 2])
+    time.sleep(0.06)
+    ttl_func([1, 2])
+    print("ttl_func stats:", ttl_func.cache_stats())
+
+    values = [1, 2]
+    ttl_func(values)
+    values[1] = 50  # keys are frozen per call, an in-place change is a new key
+    print("ttl_func after values[1] = 50:", ttl_func(values))
+
+
+def single_flight_test(n_threads=8):
+    print()
+    calls = []
+
+    @memoize
+    def slow(param):
+        calls.append(param)
+        time.sleep(0.05)
+        return param
+
+    threads = [threading.Thread(target=slow, args=(1,)) for _i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"slow(1) from {n_threads} threads - computed:", len(calls), slow.cache_stats())
+
+    # invalidated while computed: the result is returned but not stored
+    thread = threading.Thread(target=slow, args=(2,))
+    thread.start()
+    time.sleep(0.01)
+    slow.cache_invalidate(2)
+    thread.join()
+    print("slow(2) invalidated while pending - cached:", slow.cache_stats()["size"] == 1)
+
+
+def _run_threads(target, n_threads, n_calls, keys):
+    def worker():
+        for i in range(n_calls):
+            target(keys[i % len(keys)])
+
+    threads = [threading.Thread(target=worker) for _i in range(n_threads)]
+    start_time = timeit.default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return (timeit.default_timer() - start_time) / (n_threads * n_calls) * 1e9
+
+
+def hit_bench(n_calls=10 ** 5, keys=tuple(range(100))):
+    """Hit-heavy workload: 100 hot keys, all cached after the first pass"""
+    print()
+
+    def work(param):
+        return param * 2
+
+    lock = threading.Lock()
+    lru = functools.lru_cache(maxsize=128)(work)
+
+    def lru_locked(param):
+        with lock:
+            return lru(param)
+
+    cases = {
+        "lru_cache": lru,
+        "lru_cache + lock": lru_locked,
+        "memoize": memoize(work, maxsize=128),
+        "memoize ttl": memoize(work, maxsize=128, ttl=60),
+    }
+    for n_threads in (1, 4):
+        for name, cached in cases.items():
+            for key in keys:
+                cached(key)
+            exec_time = min(_run_threads(cached, n_threads, n_calls, keys) for _i in range(3))
+            print(f"{name:18} {n_threads} threads - ns per hit: {exec_time:.1f}")
+
+
+def _test():
+    """Test and debug"""
+    memoize_test()
+    single_flight_test()
+    hit_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python memoize.py
+
+func: compute 1
+func: compute 2
+func: compute 3
+func stats: {'hits': 2, 'misses': 3, 'evictions': 1, 'expired': 0, 'invalidated': 0, 'time_saved': 2.1359999664127827e-05, 'size': 2}
+func invalidate(3): True
+ttl_func: compute [1, 2]
+ttl_func: compute [1, 2]
+ttl_func stats: {'hits': 1, 'misses': 2, 'evictions': 0, 'expired': 1, 'invalidated': 0, 'time_saved': 8.309999884659192e-06, 'size': 1}
+ttl_func: compute [1, 50]
+ttl_func after values[1] = 50: 51
+
+slow(1) from 8 threads - computed: 1 {'hits': 7, 'misses': 1, 'evictions': 0, 'expired': 0, 'invalidated': 0, 'time_saved': 0.36601342400081194, 'size': 1}
+slow(2) invalidated while pending - cached: True
+
+lru_cache          1 threads - ns per hit: 203.2
+lru_cache + lock   1 threads - ns per hit: 594.0
+memoize            1 threads - ns per hit: 374.6
+memoize ttl        1 threads - ns per hit: 539.1
+lru_cache          4 threads - ns per hit: 189.4
+lru_cache + lock   4 threads - ns per hit: 905.8
+memoize            4 threads - ns per hit: 496.2
+memoize ttl        4 threads - ns per hit: 407.3
+"""
@@ -0,0 +1,303 @@
+"""Test multiton"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import gc
+import inspect
+import threading
+import time
+import timeit
+import weakref
+from collections import OrderedDict
+
+from frozen import freeze
+
+
+class _Pending:
+    """A construction in progress: the other threads asking for the key wait for it"""
+
+    __slots__ = ("event", "value", "error", "thread")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+        self.thread = threading.get_ident()
+
+
+class MultitonRegistry:
+    """One instance per key, LRU bounded by maxsize, optionally weak-valued
+
+    maxsize=None - unbounded (like MetaSingleton._instances)
+    weak=True - an instance is dropped as soon as nobody else references it
+    factory() runs outside the registry lock: other keys are served meanwhile, other
+    threads asking for the same key wait for the one instance.
+    """
+
+    def __init__(self, maxsize=128, weak=False):
+        self.maxsize = maxsize
+        self.weak = weak
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.collected = 0
+        self._data = OrderedDict()
+        self._pending = {}  # key: _Pending
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self._lookup(key) is not None
+
+    def _lookup(self, key):
+        value = self._data.get(key)
+        if value is not None and self.weak:
+            value = value()
+        return value
+
+    def _on_collect(self, key, ref):
+        with self._lock:
+            # the key can be reused by a new instance before the callback runs
+            if self._data.get(key) is ref:
+                del self._data[key]
+                self.collected += 1
+
+    def get_or_create(self, key, factory):
+        value = self._lookup(key)
+        if value is not None:
+            with self._lock:
+                if key in self._data:
+                    self._data.move_to_end(key)
+                self.hits += 1
+            return value
+
+        with self._lock:
+            value = self._lookup(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            pending = self._pending.get(key)
+            owner = pending is None
+            if owner:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+            elif pending.thread == threading.get_ident():
+                raise RuntimeError(f"{key!r} is requested while it is being created")
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            with self._lock:
+                self.hits += 1
+            return pending.value
+
+        try:
+            value = factory()
+        except BaseException as exc:
+            pending.error = exc
+            with self._lock:
+                del self._pending[key]
+            pending.event.set()
+            raise
+        with self._lock:
+            if self.weak:
+                self._data[key] = weakref.ref(value, lambda ref: self._on_collect(key, ref))
+            else:
+                self._data[key] = value
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+            del self._pending[key]
+        pending.value = value
+        pending.event.set()
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "collected": self.collected,
+        }
+
+
+def _freeze_arg(name, value):
+    """Lists, dicts and sets at any depth compare by value, other unhashables can not be keys"""
+    try:
+        return freeze(value)
+    except TypeError:
+        raise TypeError(f"multiton argument {name}={value!r} is not hashable") from None
+
+
+class MetaMultiton(type):
+    """One instance per (class, normalized constructor args)
+
+    class Client(metaclass=MetaMultiton, maxsize=2, weak=False): ...
+    Client("a") is Client(tenant="a")
+    """
+
+    def __new__(mcs, name, bases, namespace, maxsize=128, weak=False):
+        return super(MetaMultiton, mcs).__new__(mcs, name, bases, namespace)
+
+    def __init__(cls, name, bases, namespace, maxsize=128, weak=False):
+        super(MetaMultiton, cls).__init__(name, bases, namespace)
+        cls._registry = MultitonRegistry(maxsize, weak)
+        cls._signature = inspect.signature(cls.__init__)
+
+    def _key(cls, args, kwargs):
+        # Client("a") and Client(tenant="a") must share an instance
+        bound = cls._signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = list(bound.arguments.items())[1:]
+        return (cls,) + tuple((name, _freeze_arg(name, value)) for name, value in arguments)
+
+    def __call__(cls, *args, **kwargs):
+        key = cls._key(args, kwargs)
+        return cls._registry.get_or_create(
+            key, lambda: super(MetaMultiton, cls).__call__(*args, **kwargs)
+        )
+
+
+def multiton_decor(maxsize=128, weak=False):
+    """Like singleton_decor, but keyed by constructor args"""
+
+    def decor(class_def):
+        registry = MultitonRegistry(maxsize, weak)
+        signature = inspect.signature(class_def.__init__)
+
+        def get_instance(*args, **kwargs):
+            bound = signature.bind(None, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = list(bound.arguments.items())[1:]
+            key = tuple((name, _freeze_arg(name, value)) for name, value in arguments)
+            return registry.get_or_create(key, lambda: class_def(*args, **kwargs))
+
+        get_instance.registry = registry
+        return get_instance
+
+    return decor
+
+
+class TenantClient(metaclass=MetaMultiton, maxsize=2):
+    def __init__(self, tenant, timeout=10):
+        print(f"TenantClient: init {tenant} {timeout}")
+        self.tenant = tenant
+        self.timeout = timeout
+
+
+class WeakTenantClient(metaclass=MetaMultiton, maxsize=None, weak=True):
+    def __init__(self, tenant):
+        print(f"WeakTenantClient: init {tenant}")
+        self.tenant = tenant
+
+
+@multiton_decor(maxsize=2)
+class TenantDecor:
+    def __init__(self, tenant):
+        print(f"TenantDecor: init {tenant}")
+        self.tenant = tenant
+
+
+def multiton_test():
+    print()
+    client_a = TenantClient("a")
+    print("TenantClient a is a:", client_a is TenantClient(tenant="a", timeout=10))
+    print("TenantClient a is b:", client_a is TenantClient("b"))
+    TenantClient("c")  # evicts "a"
+    print("TenantClient a is a after eviction:", client_a is TenantClient("a"))
+    print("TenantClient stats:", TenantClient._registry.stats())
+
+
+def weak_multiton_test():
+    print()
+    client_a = WeakTenantClient("a")
+    print("WeakTenantClient a is a:", client_a is WeakTenantClient("a"))
+    del client_a
+    gc.collect()
+    print("WeakTenantClient stats:", WeakTenantClient._registry.stats())
+
+
+def multiton_decor_test():
+    print()
+    print("TenantDecor a is a:", TenantDecor("a") is TenantDecor(tenant="a"))
+    print("TenantDecor stats:", TenantDecor.registry.stats())
+
+
+class SlowClient(metaclass=MetaMultiton):
+    inits = []
+
+    def __init__(self, tenant, hosts=()):
+        time.sleep(0.05)  # a handshake, other tenants are not blocked meanwhile
+        self.inits.append(tenant)
+        self.hosts = hosts
+
+
+def concurrent_test(n_threads=8):
+    print()
+    threads = [
+        threading.Thread(target=SlowClient, args=("ab"[i % 2], ["h1", {"port": 80}]))
+        for i in range(n_threads)
+    ]
+    start_time = timeit.default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    exec_time = timeit.default_timer() - start_time
+    print(f"SlowClient from {n_threads} threads - inits: {sorted(SlowClient.inits)}", end=" ")
+    print(f"exec time: {exec_time:.2f}", SlowClient._registry.stats())
+    try:
+        SlowClient("a", [bytearray(b"h1")])
+    except TypeError as exc:
+        print(exc)
+
+
+def _test():
+    """Test and debug"""
+    multiton_test()
+    weak_multiton_test()
+    multiton_decor_test()
+    concurrent_test()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python multiton.py
+
+TenantClient: init a 10
+TenantClient a is a: True
+TenantClient: init b 10
+TenantClient a is b: False
+TenantClient: init c 10
+TenantClient: init a 10
+TenantClient a is a after eviction: False
+TenantClient stats: {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 4, 'evictions': 2, 'collected': 0}
+
+WeakTenantClient: init a
+WeakTenantClient a is a: True
+WeakTenantClient stats: {'size': 0, 'maxsize': None, 'hits': 1, 'misses': 1, 'evictions': 0, 'collected': 1}
+
+TenantDecor: init a
+TenantDecor a is a: True
+TenantDecor stats: {'size': 1, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 0, 'collected': 0}
+
+SlowClient from 8 threads - inits: ['a', 'b'] exec time: 0.05 {'size': 2, 'maxsize': 128, 'hits': 6, 'misses': 2, 'evictions': 0, 'collected': 0}
+multiton argument hosts=[bytearray(b'h1')] is not hashable
+"""
@@ -0,0 +1,437 @@
+"""Persistent (structurally shared) map and vector instead of copy()/deepcopy() (mutable_test)"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import copy
+import functools
+import timeit
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+
+
+class _Collision(tuple):
+    """Entries with equal full hashes"""
+
+
+def _split(entry1, entry2, shift):
+    if shift >= _HASH_BITS:
+        return _Collision((entry1, entry2))
+    idx1 = (entry1[0] >> shift) & _MASK
+    idx2 = (entry2[0] >> shift) & _MASK
+    if idx1 == idx2:
+        return {idx1: _split(entry1, entry2, shift + _BITS)}
+    return {idx1: entry1, idx2: entry2}
+
+
+def _assoc(node, shift, entry):
+    """New node with the entry and True if the key was not there"""
+    idx = (entry[0] >> shift) & _MASK
+    child = node.get(idx)
+    new_node = node.copy()  # path copy, at most 32 slots
+    added = False
+    if child is None:
+        new_node[idx] = entry
+        added = True
+    elif type(child) is dict:
+        new_node[idx], added = _assoc(child, shift + _BITS, entry)
+    elif type(child) is _Collision:
+        others = tuple(item for item in child if item[1] != entry[1])
+        added = len(others) == len(child)
+        new_node[idx] = _Collision(others + (entry,))
+    elif child[1] is entry[1] or child[1] == entry[1]:
+        new_node[idx] = entry
+    else:
+        new_node[idx] = _split(child, entry, shift + _BITS)
+        added = True
+    return new_node, added
+
+
+def _dissoc(node, shift, key_hash, key):
+    """New node without the key, the same node if the key is missing"""
+    idx = (key_hash >> shift) & _MASK
+    child = node.get(idx)
+    if child is None:
+        return node
+    if type(child) is dict:
+        new_child = _dissoc(child, shift + _BITS, key_hash, key)
+        if new_child is child:
+            return node
+    elif type(child) is _Collision:
+        new_child = _Collision(item for item in child if item[1] != key)
+        if len(new_child) == len(child):
+            return node
+        new_child = new_child if len(new_child) > 1 else new_child[0]
+    elif child[1] is key or child[1] == key:
+        new_child = None
+    else:
+        return node
+
+    new_node = node.copy()
+    if new_child is None or (type(new_child) is dict and not new_child):
+        del new_node[idx]
+    elif type(new_child) is dict and len(new_child) == 1:
+        # pull a lone entry up, so removals shrink the tree back,
+        # collisions stay at the bottom where all hash bits are equal
+        (only,) = new_child.values()
+        new_node[idx] = only if type(only) is tuple else new_child
+    else:
+        new_node[idx] = new_child
+    return new_node
+
+
+def _entries(node):
+    for child in node.values():
+        if type(child) is dict:
+            yield from _entries(child)
+        elif type(child) is _Collision:
+            yield from child
+        else:
+            yield child
+
+
+def _thaw(value):
+    if isinstance(value, PMap):
+        return value.to_dict(deep=True)
+    if isinstance(value, PVector):
+        return value.to_list(deep=True)
+    return value
+
+
+def freeze(value):
+    """Nested dicts and lists to PMap and PVector"""
+    if type(value) is dict:
+        return PMap.from_dict(value, deep=True)
+    if type(value) is list:
+        return PVector.from_list(value, deep=True)
+    return value
+
+
+class PMap:
+    """Immutable hash array mapped trie, set()/delete() return a new map in O(log32 n)
+
+    The new map shares all untouched nodes with the old one, so a snapshot is just a reference.
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, _root=None, _size=0):
+        self._root = _root if _root is not None else {}
+        self._size = _size
+
+    @classmethod
+    def from_dict(cls, mapping, deep=False):
+        pmap = cls()
+        for key, value in mapping.items():
+            pmap = pmap.set(key, freeze(value) if deep else value)
+        return pmap
+
+    def to_dict(self, deep=False):
+        if deep:
+            return {key: _thaw(value) for _hash, key, value in _entries(self._root)}
+        return {key: value for _hash, key, value in _entries(self._root)}
+
+    def set(self, key, value):
+        root, added = _assoc(self._root, 0, (hash(key) & _HASH_MASK, key, value))
+        return PMap(root, self._size + added)
+
+    def delete(self, key):
+        root = _dissoc(self._root, 0, hash(key) & _HASH_MASK, key)
+        if root is self._root:
+            raise KeyError(key)
+        return PMap(root, self._size - 1)
+
+    def update(self, mapping):
+        pmap = self
+        for key, value in mapping.items():
+            pmap = pmap.set(key, value)
+        return pmap
+
+    def __getitem__(self, key):
+        key_hash = hash(key) & _HASH_MASK
+        node = self._root
+        shift = 0
+        while True:
+            child = node.get((key_hash >> shift) & _MASK)
+            if child is None:
+                raise KeyError(key)
+            if type(child) is dict:
+                node = child
+                shift += _BITS
+                continue
+            if type(child) is _Collision:
+                for _hash, item_key, value in child:
+                    if item_key == key:
+                        return value
+                raise KeyError(key)
+            if child[1] is key or child[1] == key:
+                return child[2]
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        try:
+            self[key]  # pylint: disable=pointless-statement
+        except KeyError:
+            return False
+        return True
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return (key for _hash, key, _value in _entries(self._root))
+
+    def items(self):
+        return ((key, value) for _hash, key, value in _entries(self._root))
+
+    def __eq__(self, other):
+        if not isinstance(other, PMap):
+            return NotImplemented
+        return self._size == other._size and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"PMap({self.to_dict()!r})"
+
+
+def _new_path(shift, value):
+    node = [value]
+    for _i in range(0, shift, _BITS):
+        node = [node]
+    return node
+
+
+def _push(node, shift, index, value):
+    new_node = node.copy()
+    if shift == 0:
+        new_node.append(value)
+        return new_node
+    sub = (index >> shift) & _MASK
+    if sub < len(new_node):
+        new_node[sub] = _push(new_node[sub], shift - _BITS, index, value)
+    else:
+        new_node.append(_new_path(shift - _BITS, value))
+    return new_node
+
+
+def _assoc_index(node, shift, index, value):
+    new_node = node.copy()
+    if shift == 0:
+        new_node[index & _MASK] = value
+    else:
+        sub = (index >> shift) & _MASK
+        new_node[sub] = _assoc_index(node[sub], shift - _BITS, index, value)
+    return new_node
+
+
+def _leaves(node, shift):
+    if shift == 0:
+        yield from node
+    else:
+        for child in node:
+            yield from _leaves(child, shift - _BITS)
+
+
+class PVector:
+    """Immutable 32-way bit-partitioned trie, set()/append() return a new vector in O(log32 n)"""
+
+    __slots__ = ("_root", "_shift", "_size")
+
+    def __init__(self, _root=None, _shift=0, _size=0):
+        self._root = _root if _root is not None else []
+        self._shift = _shift
+        self._size = _size
+
+    @classmethod
+    def from_list(cls, values, deep=False):
+        return cls().extend(freeze(value) for value in values) if deep else cls().extend(values)
+
+    def to_list(self, deep=False):
+        if deep:
+            return [_thaw(value) for value in self]
+        return list(self)
+
+    def _index(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("PVector index out of range")
+        return index
+
+    def __getitem__(self, index):
+        index = self._index(index)
+        node = self._root
+        for shift in range(self._shift, 0, -_BITS):
+            node = node[(index >> shift) & _MASK]
+        return node[index & _MASK]
+
+    def set(self, index, value):
+        index = self._index(index)
+        return PVector(_assoc_index(self._root, self._shift, index, value), self._shift, self._size)
+
+    def append(self, value):
+        if self._size == 1 << (self._shift + _BITS):
+            # full tree, one level up
+            root = [self._root, _new_path(self._shift, value)]
+            return PVector(root, self._shift + _BITS, self._size + 1)
+        root = _push(self._root, self._shift, self._size, value)
+        return PVector(root, self._shift, self._size + 1)
+
+    def extend(self, values):
+        vector = self
+        for value in values:
+            vector = vector.append(value)
+        return vector
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return _leaves(self._root, self._shift)
+
+    def __eq__(self, other):
+        if not isinstance(other, PVector):
+            return NotImplemented
+        return self._size == other._size and list(self) == list(other)
+
+    def __repr__(self):
+        return f"PVector({list(self)!r})"
+
+
+def mutable_test():
+    print()
+    a = PMap.from_dict({1: [1]}, deep=True)
+    b = a.set(1, a[1].append(2))
+    print("mutable_test PMap a b:", a.to_dict(deep=True), b.to_dict(deep=True))
+
+    a = PVector.from_list([1])
+    b = a.append(2)
+    print("mutable_test PVector a b:", a.to_list(), b.to_list())
+
+    b = a.set(0, 3)
+    print("mutable_test PVector set a b:", a.to_list(), b.to_list())
+
+
+def _check(size=2000):
+    pmap = PMap()
+    pvec = PVector()
+    for i in range(size):
+        pmap = pmap.set(i, i)
+        pvec = pvec.append(i)
+    pmap = pmap.set(1.0, "float key equals int key")
+    for i in range(0, size, 2):
+        pmap = pmap.delete(i)
+    assert len(pmap) == size // 2 and pmap[1] == "float key equals int key"
+    assert sorted(pmap) == list(range(1, size, 2))
+    assert pvec.to_list() == list(range(size)) and pvec[-1] == size - 1
+    assert pvec.set(1000, "x")[1000] == "x" and pvec[1000] == 1000
+
+    class SameHash(int):
+        def __hash__(self):
+            return 1
+
+    pmap = PMap().set(SameHash(1), 1).set(SameHash(2), 2).set(SameHash(3), 3)
+    pmap = pmap.delete(SameHash(2)).set(SameHash(1), "one")
+    assert len(pmap) == 2 and pmap[SameHash(1)] == "one" and SameHash(2) not in pmap
+
+
+def _timeit(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def _list_copy_set(values):
+    new = values.copy()
+    new[1] = 0
+    return new
+
+
+def copy_modify_bench():
+    """mutable_test strategies: copy a config of n keys and change one value"""
+    for size in (10 ** 2, 10 ** 4, 10 ** 5):
+        print(f"\nconfig of {size} keys, one key changed:")
+        config = {f"key{i}": [i, i + 1] for i in range(size)}
+        pconfig = PMap.from_dict(config, deep=True)
+        number = max(1, 10 ** 5 // size)
+
+        def dict_copy():
+            new = config.copy()  # pylint: disable=cell-var-from-loop
+            new["key1"] = [0]
+
+        def dict_deepcopy():
+            new = copy.deepcopy(config)  # pylint: disable=cell-var-from-loop
+            new["key1"] = [0]
+
+        def pmap_set():
+            pconfig.set("key1", PVector.from_list([0]))  # pylint: disable=cell-var-from-loop
+
+        for func in (dict_copy, dict_deepcopy, pmap_set):
+            exec_time = _timeit(func, 1 if func is dict_deepcopy else number)
+            print(f"    {func.__name__:14} exec time: {exec_time * 1e6:.2f} us")
+        dict_get = _timeit(functools.partial(config.__getitem__, "key1"), 10 ** 5)
+        pmap_get = _timeit(functools.partial(pconfig.__getitem__, "key1"), 10 ** 5)
+        print(f"    {'dict get':14} exec time: {dict_get * 1e6:.2f} us")
+        print(f"    {'PMap get':14} exec time: {pmap_get * 1e6:.2f} us")
+
+    print()
+    for size in (10 ** 2, 10 ** 4, 10 ** 5):
+        values = list(range(size))
+        pvalues = PVector.from_list(values)
+        list_copy = _timeit(functools.partial(_list_copy_set, values), 100)
+        pvec_set = _timeit(functools.partial(pvalues.set, 1, 0), 100)
+        print(
+            f"list of {size}, one item changed:",
+            f"list copy+set {list_copy * 1e6:.2f} us PVector set {pvec_set * 1e6:.2f} us",
+        )
+
+
+def _test():
+    """Test and debug"""
+    _check()
+    mutable_test()
+    copy_modify_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python persistent.py
+
+mutable_test PMap a b: {1: [1]} {1: [1, 2]}
+mutable_test PVector a b: [1] [1, 2]
+mutable_test PVector set a b: [1] [3]
+
+config of 100 keys, one key changed:
+    dict_copy      exec time: 0.43 us
+    dict_deepcopy  exec time: 143.01 us
+    pmap_set       exec time: 2.27 us
+    dict get       exec time: 0.04 us
+    PMap get       exec time: 0.50 us
+
+config of 10000 keys, one key changed:
+    dict_copy      exec time: 49.75 us
+    dict_deepcopy  exec time: 26410.48 us
+    pmap_set       exec time: 4.55 us
+    dict get       exec time: 0.06 us
+    PMap get       exec time: 0.64 us
+
+config of 100000 keys, one key changed:
+    dict_copy      exec time: 1764.52 us
+    dict_deepcopy  exec time: 258809.56 us
+    pmap_set       exec time: 6.11 us
+    dict get       exec time: 0.06 us
+    PMap get       exec time: 0.85 us
+
+list of 100, one item changed: list copy+set 0.26 us PVector set 0.70 us
+list of 10000, one item changed: list copy+set 25.51 us PVector set 0.96 us
+list of 100000, one item changed: list copy+set 428.97 us PVector set 2.18 us
+"""
@@ -0,0 +1,512 @@
+"""One registry of MetaSingleton, singleton_decor and SingleFactory singletons: metrics, reset"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import gc
+import inspect
+import itertools
+import sys
+import threading
+import time
+import timeit
+import types
+
+import singletone
+from singletone import MetaSingleton, MetaSingletonSafe, SingleFactory
+
+# shared with the rest of the program, not retained by one instance
+_SHARED_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    types.CodeType,
+)
+
+
+def retained_size(obj):
+    """Approximate bytes reachable from obj: sys.getsizeof of every object, once
+
+    Classes, modules and functions are skipped. Other objects shared with the rest of
+    the program (interned strings, small ints, cached values) are counted all the same.
+    """
+    seen = set()
+    stack = [obj]
+    size = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return size
+
+
+def _decor_closure(get_instance):
+    """class_def and instances dict of a singleton_decor get_instance"""
+    cells = dict(zip(get_instance.__code__.co_freevars, get_instance.__closure__ or ()))
+    try:
+        return cells["class_def"].cell_contents, cells["instances"].cell_contents
+    except KeyError:
+        raise TypeError(f"{get_instance} is not made by singleton_decor") from None
+
+
+def _class_name(cls):
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+class SingletonStats:
+    """Counters of one singleton class, the instance itself stays where the strategy keeps it
+
+    fetches is a plain int, incremented without a lock: approximate under thread contention.
+    """
+
+    def __init__(self, name, strategy, peek, drop, teardown=None):
+        self.name = name
+        self.strategy = strategy
+        self.peek = peek  # the instance or None, without creating it
+        self.drop = drop
+        self.teardown = teardown
+        self.fetches = 0
+        self.constructions = 0
+        self.construct_ns = None
+
+    def to_dict(self, memory=True, fetches=True):
+        instance = self.peek()
+        return {
+            "strategy": self.strategy,
+            "exists": instance is not None,
+            "fetches": self.fetches if fetches else None,
+            "constructions": self.constructions,
+            "construct_ns": self.construct_ns,
+            "retained_bytes": retained_size(instance) if memory and instance is not None else 0,
+        }
+
+
+class SingletonRegistry:
+    """track() a singleton strategy, then snapshot() all of them or reset() one
+
+    Only the first construction is timed. Metaclasses are patched in place, so every class
+    of MetaSingleton is tracked, existing instances included; untrack() restores them.
+    A singleton_decor function can not be patched, use the returned getter instead.
+
+    A tracked fetch of an existing instance is a Python wrapper call: on par with the
+    metaclass and decorator strategies, 1.2-1.3 times an untracked SingleFactory.get_instance();
+    count_fetches=True adds a counter, about 1.6 times (overhead_bench). Stats are per class,
+    named module.qualname. A get_instance inherited from a base class is tracked for the
+    subclass and inherited again after untrack().
+    """
+
+    def __init__(self, count_fetches=False):
+        self.count_fetches = count_fetches
+        self._lock = threading.Lock()
+        self._stats = {}  # class: SingletonStats
+        self._names = {}  # name: class
+        self._untrack = []
+
+    def _add(self, key, stats, rename=False):
+        """The stats of key, a name of another class is a ValueError, or renamed name#2..."""
+        with self._lock:
+            existing = self._stats.get(key)
+            if existing is not None:
+                return existing
+            name = stats.name
+            for number in itertools.count(2):
+                if name not in self._names:
+                    break
+                if not rename:
+                    raise ValueError(f"another singleton is tracked as {name!r}")
+                name = f"{stats.name}#{number}"
+            stats.name = name
+            self._names[name] = key
+            self._stats[key] = stats
+            return stats
+
+    def _construct(self, stats, make, args, kwargs):
+        """Args passed on, not closed over: a closure would cost the hit path two cells"""
+        start_ns = time.perf_counter_ns()
+        instance = make(*args, **kwargs)
+        exec_ns = time.perf_counter_ns() - start_ns
+        with self._lock:
+            # threads racing for the first instance, the first one to finish counts
+            if stats.construct_ns is None:
+                stats.construct_ns = exec_ns
+                stats.constructions += 1
+            stats.fetches += 1
+        return instance
+
+    def track(self, target, name=None, teardown=None):
+        """MetaSingleton-like metaclass, singleton_decor function or SingleFactory-like class
+
+        teardown(instance) is called by reset(), before the instance is dropped.
+        Returns the getter to use: target itself, or a wrapper of a singleton_decor function.
+        """
+        if isinstance(target, type) and issubclass(target, type):
+            self._track_meta(target, teardown)
+            return target
+        if isinstance(target, types.FunctionType):
+            return self._track_decor(target, name, teardown)
+        if isinstance(target, type) and hasattr(target, "get_instance"):
+            self._track_factory(target, name, teardown)
+            return target
+        raise TypeError(f"{target!r} is not a known singleton strategy")
+
+    def _meta_stats(self, metaclass, cls, teardown):
+        # classes of one metaclass are found, not named: local classes may share a qualname
+        return self._add(
+            cls,
+            SingletonStats(
+                _class_name(cls),
+                metaclass.__name__,
+                lambda: cls._instances.get(cls),
+                lambda: cls._instances.pop(cls, None),
+                teardown,
+            ),
+            rename=True,
+        )
+
+    def _track_meta(self, metaclass, teardown):
+        own_call = "__call__" in metaclass.__dict__
+        call = metaclass.__call__
+        counted = {}  # cls: SingletonStats, a dict lookup is cheaper than _stats and the lock
+
+        def create(cls, args, kwargs):
+            stats = counted[cls] = self._meta_stats(metaclass, cls, teardown)
+            if cls in cls._instances:  # created meanwhile by another thread
+                stats.fetches += 1
+                return cls._instances[cls]
+            return self._construct(stats, call, (cls,) + args, kwargs)
+
+        if self.count_fetches:
+
+            def __call__(cls, *args, **kwargs):
+                try:
+                    instance = cls._instances[cls]
+                    counted[cls].fetches += 1
+                    return instance
+                except KeyError:
+                    return create(cls, args, kwargs)
+
+        else:
+
+            def __call__(cls, *args, **kwargs):
+                try:
+                    return cls._instances[cls]
+                except KeyError:
+                    return create(cls, args, kwargs)
+
+        for cls in list(metaclass._instances):
+            counted[cls] = self._meta_stats(metaclass, cls, teardown)
+        metaclass.__call__ = __call__
+
+        def untrack():
+            if own_call:
+                metaclass.__call__ = call
+            else:
+                del metaclass.__call__
+
+        self._untrack.append(untrack)
+
+    def _track_decor(self, get_instance, name, teardown):
+        class_def, instances = _decor_closure(get_instance)
+        stats = self._add(
+            class_def,
+            SingletonStats(
+                name or _class_name(class_def),
+                "singleton_decor",
+                lambda: instances.get(class_def),
+                lambda: instances.pop(class_def, None),
+                teardown,
+            ),
+        )
+
+        if self.count_fetches:
+
+            def tracked(*args, **kwargs):
+                try:
+                    instance = instances[class_def]
+                except KeyError:
+                    return self._construct(stats, get_instance, args, kwargs)
+                stats.fetches += 1
+                return instance
+
+        else:
+
+            def tracked(*args, **kwargs):
+                try:
+                    return instances[class_def]
+                except KeyError:
+                    return self._construct(stats, get_instance, args, kwargs)
+
+        tracked.__wrapped__ = get_instance
+        return tracked
+
+    def _track_factory(self, class_def, name, teardown):
+        # the classmethod object itself, also when a subclass inherits it
+        get_instance = inspect.getattr_static(class_def, "get_instance")
+        inherited = "get_instance" not in class_def.__dict__
+
+        def drop():
+            instance, class_def._instance = class_def._instance, None
+            return instance
+
+        stats = self._add(
+            class_def,
+            SingletonStats(
+                name or _class_name(class_def),
+                "get_instance",
+                lambda: class_def._instance,
+                drop,
+                teardown,
+            ),
+        )
+        create = get_instance.__get__(None, class_def)
+
+        if self.count_fetches:
+
+            def tracked(cls, *args, **kwargs):
+                instance = cls._instance
+                if not instance:
+                    return self._construct(stats, create, args, kwargs)
+                stats.fetches += 1
+                return instance
+
+        else:
+
+            def tracked(cls, *args, **kwargs):
+                instance = cls._instance
+                if not instance:
+                    return self._construct(stats, create, args, kwargs)
+                return instance
+
+        class_def.get_instance = classmethod(tracked)
+        if inherited:
+            self._untrack.append(lambda: delattr(class_def, "get_instance"))
+        else:
+            self._untrack.append(lambda: setattr(class_def, "get_instance", get_instance))
+
+    def untrack(self):
+        """Restore patched metaclasses and classes, the stats are kept"""
+        while self._untrack:
+            self._untrack.pop()()
+
+    def snapshot(self, memory=True):
+        """name: stats of every tracked singleton, memory=False skips the object walk
+
+        fetches is None unless count_fetches.
+        """
+        with self._lock:
+            stats = list(self._stats.values())
+        return {item.name: item.to_dict(memory, self.count_fetches) for item in stats}
+
+    def reset(self, *names):
+        """Teardown and drop the instances (all without names), the next fetch constructs again
+
+        Returns the names of the dropped instances. A failed teardown still drops its
+        instance; the failures are raised as one RuntimeError after all of them are reset.
+        """
+        with self._lock:
+            if names:
+                stats = [self._stats[self._names[name]] for name in names]
+            else:
+                stats = list(self._stats.values())
+        dropped = []
+        errors = {}
+        for item in stats:
+            instance = item.peek()
+            if instance is None:
+                continue
+            if item.teardown:
+                try:
+                    item.teardown(instance)
+                except Exception as exc:  # pylint: disable=broad-except
+                    errors[item.name] = exc
+            item.drop()
+            item.construct_ns = None
+            dropped.append(item.name)
+        if errors:
+            raise RuntimeError(f"teardown failed: {errors}") from next(iter(errors.values()))
+        return dropped
+
+
+REGISTRY = SingletonRegistry()
+
+
+def print_snapshot(snapshot):
+    print(
+        f"{'singleton':28} {'strategy':18} {'exists':>6} {'fetches':>8}",
+        f"{'built':>5} {'construct us':>12} {'bytes':>8}",
+    )
+    for name, stats in snapshot.items():
+        construct = "-" if stats["construct_ns"] is None else f"{stats['construct_ns'] / 1e3:.1f}"
+        fetches = "-" if stats["fetches"] is None else stats["fetches"]
+        print(
+            f"{name:28} {stats['strategy']:18} {stats['exists']!s:>6} {fetches:>8}",
+            f"{stats['constructions']:>5} {construct:>12} {stats['retained_bytes']:>8}",
+        )
+
+
+class Config(metaclass=MetaSingletonSafe):
+    """Something worth measuring: a slow __init__ and some retained data"""
+
+    def __init__(self):
+        print("Config: init")
+        time.sleep(0.01)
+        self.settings = {f"key{i}": "value" * i for i in range(100)}
+
+    def close(self):
+        print("Config: close")
+        self.settings = None
+
+
+def _close(instance):
+    close = getattr(instance, "close", None)
+    if close is not None:
+        close()
+
+
+def _broken_close(instance):
+    raise OSError(f"{type(instance).__name__}: close failed")
+
+
+def registry_test():
+    print()
+    registry = SingletonRegistry(count_fetches=True)
+    registry.track(MetaSingleton, teardown=_broken_close)
+    registry.track(MetaSingletonSafe, teardown=_close)
+    single_decor = registry.track(singletone.SingleDecor)
+    registry.track(SingleFactory)
+
+    for _i in range(3):
+        singletone.SingleMeta()
+        Config()
+        single_decor()
+        SingleFactory.get_instance()
+    print_snapshot(registry.snapshot())
+
+    print("\nreset:", registry.reset("__main__.Config", "singletone.SingleDecor"))
+    Config()
+    print_snapshot(registry.snapshot())
+    try:
+        registry.reset()
+    except RuntimeError as exc:
+        snapshot = registry.snapshot(memory=False)
+        print("reset all:", exc, "- all dropped:", not any(s["exists"] for s in snapshot.values()))
+    registry.untrack()
+    print("untracked SingleMeta is SingleMeta:", singletone.SingleMeta() is singletone.SingleMeta())
+
+    class OtherFactory(SingleFactory):
+        pass
+
+    try:
+        registry.track(OtherFactory, name="singletone.SingleFactory")
+    except ValueError as exc:
+        print("same name:", exc)
+    registry.track(OtherFactory)  # get_instance inherited from SingleFactory
+    instance = OtherFactory.get_instance()
+    stats = registry.snapshot(memory=False)[_class_name(OtherFactory)]
+    print("inherited get_instance:", type(instance).__name__, "created:", stats["exists"])
+    registry.untrack()
+    print("untracked, inherited again:", "get_instance" not in OtherFactory.__dict__)
+
+
+def _track_all(registry):
+    registry.track(MetaSingleton)
+    registry.track(MetaSingletonSafe)
+    registry.track(SingleFactory)
+    return registry.track(singletone.SingleDecor)
+
+
+def overhead_bench(number=10 ** 6, repeat=7):
+    """ns per fetch of an existing instance: untracked, tracked and counted runs in turns"""
+    print()
+    registries = [None, SingletonRegistry(), SingletonRegistry(count_fetches=True)]
+    decors = [singletone.SingleDecor]
+    for registry in registries[1:]:
+        decors.append(_track_all(registry))
+        registry.untrack()
+    # name: fetch function, looked up after track() patched it
+    cases = {
+        "SingleMeta": lambda mode: singletone.SingleMeta,
+        "SingleMetaSafe": lambda mode: singletone.SingleMetaSafe,
+        "SingleDecor": lambda mode: decors[mode],
+        "SingleFactory": lambda mode: SingleFactory.get_instance,
+    }
+    results = {name: [float("inf")] * len(registries) for name in cases}
+    for _i in range(repeat):
+        for mode, registry in enumerate(registries):
+            if registry is not None:
+                _track_all(registry)
+            for name, get_fetch in cases.items():
+                fetch = get_fetch(mode)
+                fetch()
+                exec_time = timeit.timeit(fetch, number=number) / number * 1e9
+                results[name][mode] = min(results[name][mode], exec_time)
+            if registry is not None:
+                registry.untrack()
+    print(f"{'ns per fetch':16} {'untracked':>10} {'tracked':>10} {'counted':>10}")
+    for name, times in results.items():
+        print(f"{name:16}", *[f"{exec_time:10.1f}" for exec_time in times])
+    print(
+        "fetches counted:",
+        sum(stats["fetches"] for stats in registries[2].snapshot(memory=False).values()),
+    )
+
+
+def _test():
+    """Test and debug"""
+    registry_test()
+    overhead_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python registry.py
+func: 1
+func: 1
+func: 3
+SingleVar: init
+SingleVar.foo: <singletone.SingleVar object at 0x7ff8d8883390> 1
+
+SingleMeta: init
+Config: init
+SingleDecor: init
+SingleFactory: init
+singleton                    strategy           exists  fetches built construct us    bytes
+singletone.SingleDecor       singleton_decor      True        3     1         33.8      108
+singletone.SingleFactory     get_instance         True        3     1         13.6      108
+singletone.SingleMeta        MetaSingleton        True        3     1          6.6      108
+__main__.Config              MetaSingletonSafe    True        3     1      10258.1    33034
+Config: close
+
+reset: ['__main__.Config', 'singletone.SingleDecor']
+Config: init
+singleton                    strategy           exists  fetches built construct us    bytes
+singletone.SingleDecor       singleton_decor     False        3     1            -        0
+singletone.SingleFactory     get_instance         True        3     1         13.6      108
+singletone.SingleMeta        MetaSingleton        True        3     1          6.6      108
+__main__.Config              MetaSingletonSafe    True        4     2      10252.9    33034
+Config: close
+reset all: teardown failed: {'singletone.SingleMeta': OSError('SingleMeta: close failed')} - all dropped: True
+SingleMeta: init
+untracked SingleMeta is SingleMeta: True
+same name: another singleton is tracked as 'singletone.SingleFactory'
+SingleFactory: init
+inherited get_instance: OtherFactory created: True
+untracked, inherited again: True
+
+SingleMetaSafe: init
+SingleDecor: init
+SingleFactory: init
+ns per fetch      untracked    tracked    counted
+SingleMeta            178.7      139.1      180.4
+SingleMetaSafe        129.9      139.8      184.5
+SingleDecor            99.9       73.0      104.9
+SingleFactory          66.4       86.9      106.0
+fetches counted: 28000028
+"""
@@ -2,6 +2,8 @@
 
 # pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
 
+import threading
+
 
 def func(param):
     try:
@@ -106,6 +108,38 @@ class SingleMeta(metaclass=MetaSingleton):
         self._foo = value
 
 
+# Thread-safe: a per-class lock is taken only on the first construction,
+# after that the instance is returned by a single lock-free dict lookup
+class MetaSingletonSafe(type):
+    _instances = {}
+    _locks = {}
+
+    def __call__(cls, *args, **kwargs):
+        try:
+            return cls._instances[cls]
+        except KeyError:
+            pass
+        # dict.setdefault is atomic, so all racing threads get the same lock
+        with cls._locks.setdefault(cls, threading.Lock()):
+            if cls not in cls._instances:
+                cls._instances[cls] = super(MetaSingletonSafe, cls).__call__(*args, **kwargs)
+        return cls._instances[cls]
+
+
+class SingleMetaSafe(metaclass=MetaSingletonSafe):
+    def __init__(self, foo_value=None):
+        print("SingleMetaSafe: init")
+        self._foo = foo_value or "foo"
+
+    @property
+    def foo(self):
+        return self._foo
+
+    @foo.setter
+    def foo(self, value):
+        self._foo = value
+
+
 def singleton_decor(class_def):
     instances = {}
 
@@ -144,7 +178,7 @@ class SingleFactory:
     @classmethod
     def get_instance(cls, foo_value=None):
         if not cls._instance:
-            cls._instance = SingleFactory(foo_value)
+            cls._instance = cls(foo_value)
         return cls._instance
 
     @property
@@ -192,6 +226,7 @@ def _test():
     _test_singleton(SingleInit)
     _test_singleton(SingleState)
     _test_singleton(SingleMeta)
+    _test_singleton(SingleMetaSafe)
     _test_singleton(SingleDecor)
 
     # Wrong
@@ -217,48 +252,53 @@ func: 1
 func: 1
 func: 3
 SingleVar: init
-SingleVar.foo: <__main__.SingleVar object at 0x00000201E40028E0> 1
+SingleVar.foo: <__main__.SingleVar object at 0x7f404b15e1d0> 1
 
 func2: 1
 func2: 1
 func2: 3
 
 SingleInit: init
-<class '__main__.SingleInit'>_1.foo: <__main__.SingleInit object at 0x00000201E4521D00> foo
-<class '__main__.SingleInit'>_1.foo: <__main__.SingleInit object at 0x00000201E4521D00> 1
+<class '__main__.SingleInit'>_1.foo: <__main__.SingleInit object at 0x7f404b1c1dd0> foo
+<class '__main__.SingleInit'>_1.foo: <__main__.SingleInit object at 0x7f404b1c1dd0> 1
 SingleInit: init
-<class '__main__.SingleInit'>_2.foo: <__main__.SingleInit object at 0x00000201E4521D00> 1
+<class '__main__.SingleInit'>_2.foo: <__main__.SingleInit object at 0x7f404b1c1dd0> 1
 
 SingleState: init
-<class '__main__.SingleState'>_1.foo: <__main__.SingleState object at 0x00000201E4547070> foo
-<class '__main__.SingleState'>_1.foo: <__main__.SingleState object at 0x00000201E4547070> 1
+<class '__main__.SingleState'>_1.foo: <__main__.SingleState object at 0x7f404b1c1e10> foo
+<class '__main__.SingleState'>_1.foo: <__main__.SingleState object at 0x7f404b1c1e10> 1
 SingleState: init
-<class '__main__.SingleState'>_2.foo: <__main__.SingleState object at 0x00000201E45470A0> 1
+<class '__main__.SingleState'>_2.foo: <__main__.SingleState object at 0x7f404b1c1e50> 1
 
 SingleMeta: init
-<class '__main__.SingleMeta'>_1.foo: <__main__.SingleMeta object at 0x00000201E4547070> foo
-<class '__main__.SingleMeta'>_1.foo: <__main__.SingleMeta object at 0x00000201E4547070> 1
-<class '__main__.SingleMeta'>_2.foo: <__main__.SingleMeta object at 0x00000201E4547070> 1
+<class '__main__.SingleMeta'>_1.foo: <__main__.SingleMeta object at 0x7f404b1c1e50> foo
+<class '__main__.SingleMeta'>_1.foo: <__main__.SingleMeta object at 0x7f404b1c1e50> 1
+<class '__main__.SingleMeta'>_2.foo: <__main__.SingleMeta object at 0x7f404b1c1e50> 1
+
+SingleMetaSafe: init
+<class '__main__.SingleMetaSafe'>_1.foo: <__main__.SingleMetaSafe object at 0x7f404b1c1e90> foo
+<class '__main__.SingleMetaSafe'>_1.foo: <__main__.SingleMetaSafe object at 0x7f404b1c1e90> 1
+<class '__main__.SingleMetaSafe'>_2.foo: <__main__.SingleMetaSafe object at 0x7f404b1c1e90> 1
 
 SingleDecor: init
-<function singleton_decor.<locals>.get_instance at 0x00000201E452BC10>_1.foo: <__main__.SingleDecor object at 0x00000201E45470A0> foo
-<function singleton_decor.<locals>.get_instance at 0x00000201E452BC10>_1.foo: <__main__.SingleDecor object at 0x00000201E45470A0> 1
-<function singleton_decor.<locals>.get_instance at 0x00000201E452BC10>_2.foo: <__main__.SingleDecor object at 0x00000201E45470A0> 1
+<function singleton_decor.<locals>.get_instance at 0x7f404b1d67a0>_1.foo: <__main__.SingleDecor object at 0x7f404b1c1ed0> foo
+<function singleton_decor.<locals>.get_instance at 0x7f404b1d67a0>_1.foo: <__main__.SingleDecor object at 0x7f404b1c1ed0> 1
+<function singleton_decor.<locals>.get_instance at 0x7f404b1d67a0>_2.foo: <__main__.SingleDecor object at 0x7f404b1c1ed0> 1
 
 SingleFactory: init
-<class '__main__.SingleFactory'>_1.foo: <__main__.SingleFactory object at 0x00000201E4547130> foo
-<class '__main__.SingleFactory'>_1.foo: <__main__.SingleFactory object at 0x00000201E4547130> 1
+<class '__main__.SingleFactory'>_1.foo: <__main__.SingleFactory object at 0x7f404b1c1f10> foo
+<class '__main__.SingleFactory'>_1.foo: <__main__.SingleFactory object at 0x7f404b1c1f10> 1
 SingleFactory: init
-<class '__main__.SingleFactory'>_2.foo: <__main__.SingleFactory object at 0x00000201E4547190> foo
+<class '__main__.SingleFactory'>_2.foo: <__main__.SingleFactory object at 0x7f404b30ecd0> foo
 
-<class '__main__.StaticClass'>_1.foo: <__main__.StaticClass object at 0x00000201E4547190> <bound method StaticClass.foo of <class '__main__.StaticClass'>>
-<class '__main__.StaticClass'>_1.foo: <__main__.StaticClass object at 0x00000201E4547190> 1
-<class '__main__.StaticClass'>_2.foo: <__main__.StaticClass object at 0x00000201E4547130> <bound method StaticClass.foo of <class '__main__.StaticClass'>>
+<class '__main__.StaticClass'>_1.foo: <__main__.StaticClass object at 0x7f404b30ecd0> <bound method StaticClass.foo of <class '__main__.StaticClass'>>
+<class '__main__.StaticClass'>_1.foo: <__main__.StaticClass object at 0x7f404b30ecd0> 1
+<class '__main__.StaticClass'>_2.foo: <__main__.StaticClass object at 0x7f404b1c1f10> <bound method StaticClass.foo of <class '__main__.StaticClass'>>
 
 SingleFactory: init
 SingleFactory.foo: 1
 
-StaticClass.foo: 1 <property object at 0x00000201E4530220>
+StaticClass.foo: 1 <property object at 0x7f404b1c6110>
 """
 
 
@@ -0,0 +1,333 @@
+"""Compact __slots__, dataclass and struct of arrays variants of SingleVar, SingleMeta, A/B/C"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import array
+import dataclasses
+import gc
+import sys
+import timeit
+import tracemalloc
+from typing import ClassVar
+
+import mistakes
+from singletone import MetaSingleton
+
+# dataclass(slots=True) is 3.10+, older versions get a plain dataclass with __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+class Var:
+    """SingleVar without the print, the __dict__ baseline"""
+
+    def __init__(self, foo_value=None):
+        self._foo = foo_value or "foo"
+
+    @property
+    def foo(self):
+        return self._foo
+
+    @foo.setter
+    def foo(self, value):
+        self._foo = value
+
+
+class VarSlots:
+    __slots__ = ("_foo",)
+
+    def __init__(self, foo_value=None):
+        self._foo = foo_value or "foo"
+
+    @property
+    def foo(self):
+        return self._foo
+
+    @foo.setter
+    def foo(self, value):
+        self._foo = value
+
+
+@dataclasses.dataclass(**_SLOTS)
+class VarData:
+    foo: object = "foo"
+
+
+class VarRef:
+    """One row of VarArray, made on access, not stored"""
+
+    __slots__ = ("_rows", "_index")
+
+    def __init__(self, rows, index):
+        self._rows = rows
+        self._index = index
+
+    @property
+    def foo(self):
+        return self._rows.foo[self._index]
+
+    @foo.setter
+    def foo(self, value):
+        self._rows.foo[self._index] = value
+
+
+class VarArray:
+    """Struct of arrays: a typed array per field, a row is an index, no object per row"""
+
+    __slots__ = ("foo",)
+
+    def __init__(self, typecode="q", values=()):
+        self.foo = array.array(typecode, values)
+
+    def append(self, foo_value):
+        self.foo.append(foo_value)
+
+    def __len__(self):
+        return len(self.foo)
+
+    def __getitem__(self, index):
+        return VarRef(self, index)
+
+
+class SingleInitSlots:
+    __slots__ = ("_foo",)
+    _instance = None
+
+    def __new__(cls, *args, **kwargs):
+        if not cls._instance:
+            cls._instance = super(SingleInitSlots, cls).__new__(cls, *args, **kwargs)
+        return cls._instance
+
+    def __init__(self, foo_value=None):
+        print("SingleInitSlots: init")
+        if not hasattr(self, "_foo"):  # an unset slot raises AttributeError as well
+            self._foo = foo_value or "foo"
+
+    @property
+    def foo(self):
+        return self._foo
+
+    @foo.setter
+    def foo(self, value):
+        self._foo = value
+
+
+class SingleMetaSlots(metaclass=MetaSingleton):
+    __slots__ = ("_foo",)
+
+    def __init__(self, foo_value=None):
+        print("SingleMetaSlots: init")
+        self._foo = foo_value or "foo"
+
+    @property
+    def foo(self):
+        return self._foo
+
+    @foo.setter
+    def foo(self, value):
+        self._foo = value
+
+
+# Class attributes are untouched by __slots__: B.foo = 2 shadows A.foo for B only.
+# Only instance.foo = value is gone, a slot named foo would conflict with the class attribute.
+class ASlots:
+    __slots__ = ()
+    foo = 1
+
+
+class BSlots(ASlots):
+    __slots__ = ()
+
+
+class CSlots(ASlots):
+    __slots__ = ()
+
+
+@dataclasses.dataclass(**_SLOTS)
+class AData:
+    foo: ClassVar[int] = 1
+
+
+@dataclasses.dataclass(**_SLOTS)
+class BData(AData):
+    pass
+
+
+@dataclasses.dataclass(**_SLOTS)
+class CData(AData):
+    pass
+
+
+class ABCArray:
+    """Rows of A/B/C as one byte of class index each, foo is read from the class on access"""
+
+    __slots__ = ("classes", "kinds")
+
+    def __init__(self, classes=(mistakes.A, mistakes.B, mistakes.C)):
+        self.classes = classes
+        self.kinds = array.array("B")
+
+    def append(self, cls):
+        self.kinds.append(self.classes.index(cls))
+
+    def extend(self, kinds):
+        self.kinds.extend(kinds)
+
+    def foo(self, index):
+        return self.classes[self.kinds[index]].foo
+
+    def __len__(self):
+        return len(self.kinds)
+
+
+def abc_slots_test():
+    for classes in ((ASlots, BSlots, CSlots), (AData, BData, CData)):
+        a_cls, b_cls, c_cls = classes
+        rows = ABCArray(classes)
+        for cls in classes:
+            rows.append(cls)
+        names = "/".join(cls.__name__ for cls in classes)
+        print(f"\n{names}:", a_cls.foo, b_cls.foo, c_cls.foo, "rows:", *map(rows.foo, range(3)))
+        b_cls.foo = 2
+        print(f"{names}:", a_cls.foo, b_cls.foo, c_cls.foo, "rows:", *map(rows.foo, range(3)))
+        a_cls.foo = 3
+        print(f"{names}:", a_cls.foo, b_cls.foo, c_cls.foo, "rows:", *map(rows.foo, range(3)))
+        try:
+            b_cls().foo = 4
+        except AttributeError as exc:
+            print(f"{b_cls.__name__}().foo = 4:", exc)
+
+
+def singleton_slots_test():
+    print()
+    for class_def in (SingleInitSlots, SingleMetaSlots):
+        first = class_def()
+        second = class_def()
+        print(f"{class_def.__name__}:", first is second, first.foo, hasattr(first, "__dict__"))
+
+
+def _objects(class_def):
+    return lambda size: [class_def(i) for i in range(size)]
+
+
+def _access_objects(objs):
+    for obj in objs:
+        obj.foo  # pylint: disable=pointless-statement
+
+
+def _access_array(rows):
+    foo = rows.foo
+    for i in range(len(foo)):
+        foo[i]  # pylint: disable=pointless-statement
+
+
+def _access_refs(rows):
+    for i in range(len(rows)):
+        rows[i].foo  # pylint: disable=pointless-statement
+
+
+def _abc_objects(classes):
+    return lambda size: [classes[i % 3]() for i in range(size)]
+
+
+def _abc_array(size):
+    rows = ABCArray()
+    rows.extend(i % 3 for i in range(size))
+    return rows
+
+
+def _access_abc_array(rows):
+    for i in range(len(rows)):
+        rows.foo(i)
+
+
+# name: (make size rows, access every row's foo)
+FOOTPRINT_CASES = {
+    "Var __dict__": (_objects(Var), _access_objects),
+    "VarSlots": (_objects(VarSlots), _access_objects),
+    "VarData slots": (_objects(VarData), _access_objects),
+    "VarArray foo[i]": (lambda size: VarArray("q", range(size)), _access_array),
+    "VarArray[i].foo": (lambda size: VarArray("q", range(size)), _access_refs),
+    "A/B/C __dict__": (_abc_objects((mistakes.A, mistakes.B, mistakes.C)), _access_objects),
+    "A/B/C slots": (_abc_objects((ASlots, BSlots, CSlots)), _access_objects),
+    "A/B/C data slots": (_abc_objects((AData, BData, CData)), _access_objects),
+    "ABCArray": (_abc_array, _access_abc_array),
+}
+
+
+def footprint_bench(sizes=(10 ** 6, 10 ** 7)):
+    """Traced bytes per row, the list slot (8 bytes) and int boxes included, and ns per access"""
+    for size in sizes:
+        print(f"\n{size} rows:")
+        for name, (make, access) in FOOTPRINT_CASES.items():
+            gc.collect()
+            tracemalloc.start()
+            rows = make(size)
+            current, _peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            start_time = timeit.default_timer()
+            access(rows)
+            exec_time = timeit.default_timer() - start_time
+            print(
+                f"    {name:18} bytes per row: {current / size:6.1f}",
+                f"access: {exec_time / size * 1e9:.1f} ns",
+            )
+            del rows
+
+
+def _test():
+    """Test and debug"""
+    abc_slots_test()
+    singleton_slots_test()
+    footprint_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python slots_classes.py
+func: 1
+func: 1
+func: 3
+SingleVar: init
+SingleVar.foo: <singletone.SingleVar object at 0x7f235fcbd950> 1
+
+ASlots/BSlots/CSlots: 1 1 1 rows: 1 1 1
+ASlots/BSlots/CSlots: 1 2 1 rows: 1 2 1
+ASlots/BSlots/CSlots: 3 2 3 rows: 3 2 3
+BSlots().foo = 4: 'BSlots' object attribute 'foo' is read-only
+
+AData/BData/CData: 1 1 1 rows: 1 1 1
+AData/BData/CData: 1 2 1 rows: 1 2 1
+AData/BData/CData: 3 2 3 rows: 3 2 3
+BData().foo = 4: 'BData' object attribute 'foo' is read-only
+
+SingleInitSlots: init
+SingleInitSlots: init
+SingleInitSlots: True foo False
+SingleMetaSlots: init
+SingleMetaSlots: True foo False
+
+1000000 rows:
+    Var __dict__       bytes per row:  120.4 access: 90.9 ns
+    VarSlots           bytes per row:   80.4 access: 96.7 ns
+    VarData slots      bytes per row:   80.4 access: 15.2 ns
+    VarArray foo[i]    bytes per row:    8.2 access: 75.0 ns
+    VarArray[i].foo    bytes per row:    8.2 access: 580.1 ns
+    A/B/C __dict__     bytes per row:   80.5 access: 54.1 ns
+    A/B/C slots        bytes per row:   40.4 access: 32.8 ns
+    A/B/C data slots   bytes per row:   40.4 access: 37.8 ns
+    ABCArray           bytes per row:    1.0 access: 146.8 ns
+
+10000000 rows:
+    Var __dict__       bytes per row:  120.9 access: 90.5 ns
+    VarSlots           bytes per row:   80.9 access: 86.7 ns
+    VarData slots      bytes per row:   80.9 access: 14.6 ns
+    VarArray foo[i]    bytes per row:    8.2 access: 71.9 ns
+    VarArray[i].foo    bytes per row:    8.2 access: 541.2 ns
+    A/B/C __dict__     bytes per row:   80.9 access: 44.4 ns
+    A/B/C slots        bytes per row:   40.9 access: 29.0 ns
+    A/B/C data slots   bytes per row:   40.9 access: 44.3 ns
+    ABCArray           bytes per row:    1.0 access: 138.8 ns
+"""
@@ -0,0 +1,342 @@
+"""SingleState shared state saved once and mapped back with mmap on startup, no rebuild"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import array
+import collections.abc
+import contextlib
+import hashlib
+import math
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import timeit
+import zlib
+
+# magic, tag digest, count, slots, values typecode; then values, key offsets, slots, keys
+_MAGIC = b"SNAPv1\0\0"
+_HEADER = struct.Struct("<8s16sQQc7x")
+_INDEX = "I"  # offsets and slots, 4 bytes each, so up to 4 GiB of keys
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _digest(tag):
+    return hashlib.blake2b(tag.encode(), digest_size=16).digest()
+
+
+def _pad(size):
+    return -size % 8
+
+
+def _slot_count(count):
+    slots = 8
+    while slots < 2 * count:
+        slots *= 2
+    return slots
+
+
+def save_snapshot(path, mapping, tag="", typecode="d"):
+    """str keys -> numbers as one file, written aside and renamed, so readers never see half
+
+    Open addressing on zlib.crc32 of the key, hash() of str is salted per process.
+    """
+    keys = [key.encode() for key in mapping]
+    values = array.array(typecode, mapping.values())
+    offsets = array.array(_INDEX, [0])
+    try:
+        for key in keys:
+            offsets.append(offsets[-1] + len(key))
+    except OverflowError as exc:
+        raise SnapshotError("keys do not fit a 4 GiB snapshot") from exc
+    slots = array.array(_INDEX, bytes(array.array(_INDEX).itemsize * _slot_count(len(keys))))
+    mask = len(slots) - 1
+    for index, key in enumerate(keys):
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = index + 1  # 0 - empty slot
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            file.write(_HEADER.pack(_MAGIC, _digest(tag), len(keys), len(slots), typecode.encode()))
+            for part in (values.tobytes(), offsets.tobytes(), slots.tobytes()):
+                file.write(part)
+                file.write(bytes(_pad(len(part))))
+            file.writelines(keys)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+class MappedTable(collections.abc.Mapping):
+    """Read-only mapping over a snapshot file, pages are read on first touch
+
+    values is a zero-copy memoryview of the typed values array. A file that is not a
+    complete snapshot of the tag raises SnapshotError.
+    """
+
+    def __init__(self, path, tag=""):
+        self._views = []  # released before the mmap is closed, it can not close while exported
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < _HEADER.size:  # an empty file can not be mapped
+                raise SnapshotError("truncated snapshot header")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._map(_digest(tag))
+        except SnapshotError:
+            self.close()
+            raise
+        except (ValueError, TypeError, IndexError) as exc:  # bad typecode, sizes
+            self.close()
+            raise SnapshotError(f"corrupt snapshot: {exc}") from exc
+
+    def _view(self, view):
+        self._views.append(view)
+        return view
+
+    def _map(self, digest):
+        magic, file_digest, count, slots, typecode = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            raise SnapshotError("not a snapshot file")
+        if file_digest != digest:
+            raise SnapshotError("snapshot of another tag, stale")
+        if slots & (slots - 1) or slots <= count:  # _find needs a free slot to stop at
+            raise SnapshotError(f"corrupt snapshot: {slots} slots for {count} keys")
+        view = self._view(memoryview(self._mmap))
+        offset = _HEADER.size
+        parts = []
+        layout = ((typecode.decode(), count), (_INDEX, count + 1), (_INDEX, slots))
+        for part_typecode, length in layout:
+            size = length * array.array(part_typecode).itemsize
+            if offset + size > len(view):
+                raise SnapshotError("truncated snapshot")
+            parts.append(self._view(view[offset : offset + size].cast(part_typecode)))
+            offset += size + _pad(size)
+        self.values, self._offsets, self._slots = parts
+        self._keys = self._view(view[offset:])
+        if len(self._keys) != self._offsets[-1]:
+            raise SnapshotError("truncated snapshot keys")
+        self._mask = slots - 1
+
+    def _find(self, key):
+        """Checked per probe, not on open: a pass over the slots would cost the mmap startup"""
+        slots, offsets, keys = self._slots, self._offsets, self._keys
+        count = len(self.values)
+        slot = zlib.crc32(key) & self._mask
+        for _probe in range(len(slots)):
+            index = slots[slot]
+            if not index:
+                return -1
+            if index > count:
+                raise SnapshotError(f"corrupt snapshot: slot {slot} past {count} keys")
+            index -= 1
+            if keys[offsets[index] : offsets[index + 1]] == key:
+                return index
+            slot = (slot + 1) & self._mask
+        raise SnapshotError("corrupt snapshot: no free slot")
+
+    def __getitem__(self, key):
+        index = self._find(key.encode())
+        if index < 0:
+            raise KeyError(key)
+        return self.values[index]
+
+    def __contains__(self, key):
+        return self._find(key.encode()) >= 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        offsets, keys = self._offsets, self._keys
+        for index in range(len(self.values)):
+            yield bytes(keys[offsets[index] : offsets[index + 1]]).decode()
+
+    def close(self):
+        while self._views:
+            self._views.pop().release()
+        self._mmap.close()
+
+
+class SnapshotState:
+    """SingleState with _foo mapped from a snapshot file instead of rebuilt on every start
+
+    The tag names the build of the state (code version, input digest): a snapshot of
+    another tag is stale and rebuilt.
+    """
+
+    _foo = None
+
+    def __init__(self, foo_value=None):
+        print("SnapshotState: init")
+        if SnapshotState._foo is None:
+            SnapshotState._foo = foo_value or {}
+
+    @classmethod
+    def restore(cls, path, build, tag="", typecode="d"):
+        """Map the snapshot at path, or build(), save and map it; True when rebuilt"""
+        cls.close()
+        try:
+            cls._foo = MappedTable(path, tag)
+            return False
+        except (FileNotFoundError, SnapshotError):
+            pass
+        save_snapshot(path, build(), tag, typecode)
+        cls._foo = MappedTable(path, tag)
+        return True
+
+    @classmethod
+    def close(cls):
+        if isinstance(cls._foo, MappedTable):
+            cls._foo.close()
+        cls._foo = None
+
+    @property
+    def foo(self):
+        return SnapshotState._foo
+
+    @foo.setter
+    def foo(self, value):
+        SnapshotState._foo = value
+
+
+def build_state(size, work=10):
+    """Stand-in for the expensive precomputed lookup structure"""
+    return {f"key{i}": math.fsum(math.sin(i * k) for k in range(work)) for i in range(size)}
+
+
+def restore_test():
+    print()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "state.snap")
+        for tag in ("v1", "v1", "v2"):
+            rebuilt = SnapshotState.restore(path, lambda: build_state(1000), tag)
+            single_state = SnapshotState()
+            print(f"restore tag {tag} - rebuilt: {rebuilt},", end=" ")
+            print("foo['key7']:", single_state.foo["key7"], "len:", len(single_state.foo))
+        print("key7 equal to the build:", SnapshotState().foo["key7"] == build_state(8)["key7"])
+        print("missing key:", single_state.foo.get("missing"), "keys:", list(single_state.foo)[:3])
+        SnapshotState.close()
+
+        with open(path, "r+b") as file:
+            file.truncate(os.path.getsize(path) // 2)
+        print("truncated - rebuilt:", SnapshotState.restore(path, lambda: build_state(1000), "v2"))
+        SnapshotState.close()
+        with open(path, "wb"):
+            pass
+        print("empty - rebuilt:", SnapshotState.restore(path, lambda: build_state(1000), "v2"))
+        SnapshotState.close()
+
+        # slot tables that _find would probe forever or index out of range
+        slots_at = _HEADER.size + 3 * 8 + 4 * 4  # header, 3 values, 3 + 1 key offsets
+        for slot_value in (1, 9):
+            save_snapshot(path, {"a": 1.0, "b": 2.0, "c": 3.0})
+            with open(path, "r+b") as file:
+                file.seek(slots_at)
+                file.write(array.array(_INDEX, [slot_value] * 8).tobytes())
+            table = MappedTable(path)
+            try:
+                table.get("missing")
+            except SnapshotError as exc:
+                print(f"slots all {slot_value}:", exc)
+            table.close()
+
+
+def startup_bench(sizes=(10 ** 4, 10 ** 5, 10 ** 6), lookups=10 ** 4):
+    """Startup: cold rebuild vs pickle load vs mmap restore, then lookup cost"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in sizes:
+            print(f"\n{size} entries:")
+            path = os.path.join(tmp_dir, f"{size}.snap")
+            pickle_path = os.path.join(tmp_dir, f"{size}.pickle")
+            start_time = timeit.default_timer()
+            state = build_state(size)
+            build_time = timeit.default_timer() - start_time
+            save_snapshot(path, state)
+            with open(pickle_path, "wb") as file:
+                pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+
+            def pickle_load(pickle_path=pickle_path):
+                with open(pickle_path, "rb") as file:
+                    return pickle.load(file)
+
+            def mmap_restore(path=path):
+                table = MappedTable(path)
+                table["key1"]  # pylint: disable=pointless-statement
+                table.close()
+
+            print(f"    cold rebuild    startup: {build_time:.6f} s")
+            for name, func, file_path in (
+                ("pickle load", pickle_load, pickle_path),
+                ("mmap restore", mmap_restore, path),
+            ):
+                exec_time = min(timeit.repeat(func, number=1, repeat=3))
+                file_size = os.path.getsize(file_path) / 2 ** 20
+                print(f"    {name:15} startup: {exec_time:.6f} s file: {file_size:.1f} MiB")
+
+            table = MappedTable(path)
+            keys = [f"key{i * 7919 % size}" for i in range(lookups)]
+            for name, mapping in (("dict", state), ("MappedTable", table)):
+                exec_time = min(
+                    timeit.repeat(lambda mapping=mapping: [mapping[key] for key in keys], number=1)
+                )
+                print(f"    {name:15} lookup: {exec_time / lookups * 1e9:.1f} ns")
+            table.close()
+
+
+def _test():
+    """Test and debug"""
+    restore_test()
+    startup_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python state_snapshot.py
+
+SnapshotState: init
+restore tag v1 - rebuilt: True, foo['key7']: 0.10250320930222293 len: 1000
+SnapshotState: init
+restore tag v1 - rebuilt: False, foo['key7']: 0.10250320930222293 len: 1000
+SnapshotState: init
+restore tag v2 - rebuilt: True, foo['key7']: 0.10250320930222293 len: 1000
+SnapshotState: init
+key7 equal to the build: True
+missing key: None keys: ['key0', 'key1', 'key2']
+truncated - rebuilt: True
+empty - rebuilt: True
+slots all 1: corrupt snapshot: no free slot
+slots all 9: corrupt snapshot: slot 1 past 3 keys
+
+10000 entries:
+    cold rebuild    startup: 0.016865 s
+    pickle load     startup: 0.001208 s file: 0.2 MiB
+    mmap restore    startup: 0.000029 s file: 0.3 MiB
+    dict            lookup: 47.8 ns
+    MappedTable     lookup: 817.3 ns
+
+100000 entries:
+    cold rebuild    startup: 0.194294 s
+    pickle load     startup: 0.020862 s file: 1.9 MiB
+    mmap restore    startup: 0.000034 s file: 2.9 MiB
+    dict            lookup: 133.3 ns
+    MappedTable     lookup: 1069.0 ns
+
+1000000 entries:
+    cold rebuild    startup: 2.634919 s
+    pickle load     startup: 0.456455 s file: 19.9 MiB
+    mmap restore    startup: 0.000035 s file: 27.9 MiB
+    dict            lookup: 155.7 ns
+    MappedTable     lookup: 1726.6 ns
+"""
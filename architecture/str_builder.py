@@ -0,0 +1,275 @@
+"""String builders for multi-megabyte payloads instead of += (func_str1) and join (func_str2)"""
+
+# pylint: disable=missing-function-docstring,missing-class-docstring,too-few-public-methods
+
+import gc
+import io
+import timeit
+import tracemalloc
+
+
+class BytesBuilder:
+    """Bytes chunks streamed into one bytearray
+
+    capacity=None - growable, bytearray += is amortized O(1) and as fast as join
+    capacity=N - preallocated, no growth copies, so peak memory is the payload itself,
+    falls back to growable when the payload does not fit
+    getbuffer() is a zero-copy memoryview of the result for file.write()/sock.sendall().
+    Release the view before the next append(), a bytearray with exports cannot grow.
+    """
+
+    def __init__(self, capacity=None):
+        self._buf = bytearray(capacity or 0)
+        self._view = memoryview(self._buf) if capacity else None
+        self._size = 0
+
+    def __len__(self):
+        return self._size if self._view is not None else len(self._buf)
+
+    def _to_growable(self):
+        self._view.release()
+        self._view = None
+        del self._buf[self._size :]
+
+    def append(self, chunk):
+        if self._view is None:
+            self._buf += chunk
+            return self
+        end = self._size + len(chunk)
+        if end > len(self._buf):
+            self._to_growable()
+            self._buf += chunk
+            return self
+        self._view[self._size : end] = chunk
+        self._size = end
+        return self
+
+    def append_text(self, text, encoding="utf-8"):
+        return self.append(text.encode(encoding))
+
+    def consume(self, chunks):
+        """Drain a generator of chunks from a streaming producer"""
+        if self._view is not None:
+            for chunk in chunks:
+                self.append(chunk)
+            return self
+        buf = self._buf
+        for chunk in chunks:
+            buf += chunk
+        return self
+
+    def getbuffer(self):
+        return memoryview(self._buf)[: len(self)]
+
+    def getvalue(self):
+        """A copy, prefer getbuffer() or write_to()"""
+        return bytes(self.getbuffer())
+
+    def write_to(self, stream):
+        """Zero-copy handoff to a binary file or a socket"""
+        with self.getbuffer() as view:
+            if hasattr(stream, "sendall"):
+                stream.sendall(view)
+            else:
+                stream.write(view)
+        return len(self)
+
+    def clear(self):
+        if self._view is not None:
+            self._size = 0
+        else:
+            self._buf.clear()
+
+
+class StringBuilder:
+    """Text chunks, joined once on build() or written without joining at all"""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, chunk):
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        return self
+
+    def consume(self, chunks):
+        for chunk in chunks:
+            self.append(chunk)
+        return self
+
+    def build(self):
+        return "".join(self._chunks)
+
+    def write_to(self, stream):
+        stream.writelines(self._chunks)
+        return self._size
+
+
+def str_plus(chunk, count):
+    ret_str = ""
+    for _i in range(count):
+        ret_str += chunk
+    return ret_str
+
+
+def str_join(chunk, count):
+    ret_str = []
+    for _i in range(count):
+        ret_str.append(chunk)
+    return "".join(ret_str)
+
+
+def str_io(chunk, count):
+    buf = io.StringIO()
+    for _i in range(count):
+        buf.write(chunk)
+    return buf.getvalue()
+
+
+def str_builder(chunk, count):
+    builder = StringBuilder()
+    for _i in range(count):
+        builder.append(chunk)
+    return builder.build()
+
+
+def bytes_builder(chunk, count):
+    builder = BytesBuilder()
+    chunk = chunk.encode()
+    for _i in range(count):
+        builder.append(chunk)
+    return builder.getbuffer()
+
+
+def bytes_builder_prealloc(chunk, count):
+    builder = BytesBuilder(len(chunk) * count)
+    chunk = chunk.encode()
+    for _i in range(count):
+        builder.append(chunk)
+    return builder.getbuffer()
+
+
+def bytes_builder_consume(chunk, count):
+    chunk = chunk.encode()
+    return BytesBuilder().consume(chunk for _i in range(count)).getbuffer()
+
+
+STR_FUNCS = (
+    str_plus,
+    str_join,
+    str_io,
+    str_builder,
+    bytes_builder,
+    bytes_builder_prealloc,
+    bytes_builder_consume,
+)
+
+
+def _exec_time(func, chunk, count):
+    gc.collect()
+    start_time = timeit.default_timer()
+    func(chunk, count)
+    return timeit.default_timer() - start_time
+
+
+def _peak_memory(func, chunk, count):
+    gc.collect()
+    tracemalloc.start()
+    ret = func(chunk, count)
+    _size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ret
+    return peak
+
+
+def str_bench(chunk_lens=(10, 10 ** 3), counts=(10 ** 2, 10 ** 4, 10 ** 6), max_total=10 ** 8):
+    """str_test over chunk sizes and counts: best of 3 time and peak traced memory"""
+    for chunk_len in chunk_lens:
+        for count in counts:
+            if chunk_len * count > max_total:
+                continue
+            print(f"\nchunk {chunk_len} x {count}:")
+            chunk = "q" * chunk_len
+            for func in STR_FUNCS:
+                exec_time = min(_exec_time(func, chunk, count) for _i in range(3))
+                peak = _peak_memory(func, chunk, count)
+                print(
+                    f"    {func.__name__:24}",
+                    f"exec time: {exec_time:.6f} peak: {peak / 2 ** 20:.2f} MiB",
+                )
+
+
+def handoff_test():
+    print()
+    builder = BytesBuilder().consume(b"q" * 10 for _i in range(3))
+    with io.BytesIO() as file:
+        print("write_to:", builder.write_to(file), file.getvalue())
+    builder.append_text("йй")
+    print("getvalue:", builder.getvalue(), len(builder))
+
+
+def _test():
+    """Test and debug"""
+    handoff_test()
+    str_bench()
+
+
+if __name__ == "__main__":
+    _test()
+
+
+r"""
+>python str_builder.py
+
+write_to: 30 b'qqqqqqqqqqqqqqqqqqqqqqqqqqqqqq'
+getvalue: b'qqqqqqqqqqqqqqqqqqqqqqqqqqqqqq\xd0\xb9\xd0\xb9' 34
+
+chunk 10 x 100:
+    str_plus                 exec time: 0.000016 peak: 0.00 MiB
+    str_join                 exec time: 0.000008 peak: 0.00 MiB
+    str_io                   exec time: 0.000015 peak: 0.00 MiB
+    str_builder              exec time: 0.000024 peak: 0.00 MiB
+    bytes_builder            exec time: 0.000028 peak: 0.00 MiB
+    bytes_builder_prealloc   exec time: 0.000048 peak: 0.00 MiB
+    bytes_builder_consume    exec time: 0.000023 peak: 0.00 MiB
+
+chunk 10 x 10000:
+    str_plus                 exec time: 0.000875 peak: 0.10 MiB
+    str_join                 exec time: 0.000500 peak: 0.18 MiB
+    str_io                   exec time: 0.000886 peak: 0.18 MiB
+    str_builder              exec time: 0.001191 peak: 0.18 MiB
+    bytes_builder            exec time: 0.001529 peak: 0.11 MiB
+    bytes_builder_prealloc   exec time: 0.003612 peak: 0.10 MiB
+    bytes_builder_consume    exec time: 0.001077 peak: 0.11 MiB
+
+chunk 10 x 1000000:
+    str_plus                 exec time: 0.090976 peak: 9.54 MiB
+    str_join                 exec time: 0.042720 peak: 17.59 MiB
+    str_io                   exec time: 0.101239 peak: 19.07 MiB
+    str_builder              exec time: 0.115908 peak: 17.59 MiB
+    bytes_builder            exec time: 0.153358 peak: 10.37 MiB
+    bytes_builder_prealloc   exec time: 0.377142 peak: 9.54 MiB
+    bytes_builder_consume    exec time: 0.107085 peak: 10.37 MiB
+
+chunk 1000 x 100:
+    str_plus                 exec time: 0.000015 peak: 0.10 MiB
+    str_join                 exec time: 0.000011 peak: 0.10 MiB
+    str_io                   exec time: 0.000029 peak: 0.10 MiB
+    str_builder              exec time: 0.000032 peak: 0.10 MiB
+    bytes_builder            exec time: 0.000026 peak: 0.10 MiB
+    bytes_builder_prealloc   exec time: 0.000033 peak: 0.10 MiB
+    bytes_builder_consume    exec time: 0.000032 peak: 0.10 MiB
+
+chunk 1000 x 10000:
+    str_plus                 exec time: 0.001682 peak: 9.54 MiB
+    str_join                 exec time: 0.001186 peak: 9.62 MiB
+    str_io                   exec time: 0.001186 peak: 9.62 MiB
+    str_builder              exec time: 0.001894 peak: 9.62 MiB
+    bytes_builder            exec time: 0.001639 peak: 10.49 MiB
+    bytes_builder_prealloc   exec time: 0.002913 peak: 9.54 MiB
+    bytes_builder_consume    exec time: 0.001585 peak: 10.49 MiB
+"""